@@ -0,0 +1,213 @@
+import gzip
+import os
+import zlib
+from datetime import datetime, timedelta
+
+import click
+from flask import request
+from flask.cli import AppGroup
+from sqlalchemy import delete, insert, literal, or_, select, text, union_all
+
+from models import db, Notification, NotificationArchive, Conversation, Message, MessageArchive
+from export import jsonl_line
+
+PARTITIONED_TABLES = ('notification', 'message')
+
+
+def _month_start(value):
+    return datetime(value.year, value.month, 1)
+
+
+def _next_month(value):
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def _create_partition(table, partition, lower, upper):
+    bounds = f"FOR VALUES FROM ('{lower:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+    in_range = f"created_at >= '{lower:%Y-%m-%d}' AND created_at < '{upper:%Y-%m-%d}'"
+    stranded = db.session.execute(text(f'SELECT EXISTS (SELECT 1 FROM {table}_default WHERE {in_range})')).scalar()
+    if not stranded:
+        db.session.execute(text(f'CREATE TABLE {partition} PARTITION OF {table} {bounds}'))
+        return
+
+    # Rows for this month already went to the default partition, and Postgres
+    # will not create a partition those rows would belong to. Take the default
+    # out, move them over and put it back; the parent stays locked meanwhile,
+    # so writers wait instead of failing
+    db.session.execute(text(f'ALTER TABLE {table} DETACH PARTITION {table}_default'))
+    db.session.execute(text(f'CREATE TABLE {partition} PARTITION OF {table} {bounds}'))
+    db.session.execute(text(f'INSERT INTO {partition} SELECT * FROM {table}_default WHERE {in_range}'))
+    db.session.execute(text(f'DELETE FROM {table}_default WHERE {in_range}'))
+    db.session.execute(text(f'ALTER TABLE {table} ATTACH PARTITION {table}_default DEFAULT'))
+
+
+def ensure_monthly_partitions(months_ahead=3, start=None):
+    """Create the monthly ``created_at`` partitions on Postgres.
+
+    Rows outside every monthly partition land in ``{table}_default``; those
+    are moved into the new partition when their month gets one. Other
+    databases keep plain tables, so this is a no-op there.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return []
+
+    created = []
+    month = _month_start(start or datetime.utcnow())
+    for _ in range(months_ahead + 1):
+        upper = _next_month(month)
+        for table in PARTITIONED_TABLES:
+            partition = f'{table}_y{month.year}m{month.month:02d}'
+            if db.session.execute(text('SELECT to_regclass(:name)'), {'name': partition}).scalar() is None:
+                _create_partition(table, partition, month, upper)
+                # One transaction per partition keeps the parent locked briefly
+                db.session.commit()
+                created.append(partition)
+        month = upper
+    return created
+
+
+def _archive_columns(model):
+    return [column.name for column in model.__table__.columns]
+
+
+def _move_to_table(model, archive_model, ids):
+    columns = _archive_columns(model)
+    source = model.__table__
+    db.session.execute(
+        insert(archive_model.__table__).from_select(
+            columns + ['archived_at'],
+            select(*[source.c[name] for name in columns], literal(datetime.utcnow())).where(source.c.id.in_(ids))
+        )
+    )
+    db.session.execute(delete(source).where(source.c.id.in_(ids)))
+
+
+def _sync(fh):
+    # Text buffer -> gzip stream -> file -> disk. A sync flush leaves a stream
+    # that decompresses up to this point even if the process dies before close
+    fh.flush()
+    fh.buffer.flush(zlib.Z_SYNC_FLUSH)
+    os.fsync(fh.buffer.fileno())
+
+
+def _move_to_file(model, ids, fh):
+    source = model.__table__
+    for row in db.session.execute(select(source).where(source.c.id.in_(ids)).order_by(source.c.id)):
+        fh.write(jsonl_line(row))
+    # The rows are on disk before their DELETE can commit
+    _sync(fh)
+    db.session.execute(delete(source).where(source.c.id.in_(ids)))
+
+
+def _open_export(output_dir, name):
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f'{name}-{datetime.utcnow():%Y%m%d%H%M%S}.jsonl.gz')
+    return gzip.open(path, 'at', encoding='utf-8')
+
+
+def _move_batches(model, archive_model, criteria, batch_size, fh=None, progress=None):
+    moved = 0
+    while True:
+        ids = [row.id for row in db.session.query(model.id).filter(*criteria).order_by(model.id).limit(batch_size)]
+        if not ids:
+            return moved
+
+        if fh is None:
+            _move_to_table(model, archive_model, ids)
+        else:
+            _move_to_file(model, ids, fh)
+        # Commit per batch so locks are only ever held on batch_size rows
+        db.session.commit()
+
+        moved += len(ids)
+        if progress:
+            progress(moved)
+
+
+def archive_read_notifications(older_than_days=90, batch_size=1000, output_dir=None, progress=None):
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    criteria = [Notification.read.is_(True), Notification.created_at < cutoff]
+
+    if output_dir is None:
+        return _move_batches(Notification, NotificationArchive, criteria, batch_size, progress=progress)
+    with _open_export(output_dir, 'notifications') as fh:
+        return _move_batches(Notification, NotificationArchive, criteria, batch_size, fh, progress)
+
+
+def archive_closed_conversations(older_than_days=180, batch_size=1000, output_dir=None, progress=None):
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    conversation_ids = [row.id for row in db.session.query(Conversation.id).filter(
+        Conversation.status == 'closed',
+        Conversation.closed_at < cutoff,
+        or_(Conversation.archived_at.is_(None), Conversation.archived_at < Conversation.closed_at)
+    )]
+
+    fh = _open_export(output_dir, 'messages') if output_dir else None
+    moved = 0
+    try:
+        for conversation_id in conversation_ids:
+            moved += _move_batches(Message, MessageArchive, [Message.conversation_id == conversation_id],
+                                   batch_size, fh)
+            Conversation.query.filter_by(id=conversation_id).update({Conversation.archived_at: datetime.utcnow()})
+            db.session.commit()
+            if progress:
+                progress(moved)
+    finally:
+        if fh:
+            fh.close()
+    return moved
+
+
+def include_archived():
+    return request.args.get('include_archived', '').lower() in ('1', 'true', 'yes')
+
+
+def with_archive(model, archive_model):
+    """Union of the live and archive table, exposing the live table's columns
+    plus an ``archived`` flag."""
+    columns = _archive_columns(model)
+    live = select(*[model.__table__.c[name] for name in columns], literal(False).label('archived'))
+    archived = select(*[archive_model.__table__.c[name] for name in columns], literal(True).label('archived'))
+    return union_all(live, archived).subquery()
+
+
+def row_to_dict(row, datetime_format=Message.datetime_format):
+    return {
+        key: value.strftime(datetime_format) if isinstance(value, datetime) else value
+        for key, value in row._mapping.items()
+    }
+
+
+archive_cli = AppGroup('archive', help='Partition maintenance and retention jobs.')
+
+
+@archive_cli.command('partitions')
+@click.option('--months-ahead', default=3, show_default=True)
+def partitions_command(months_ahead):
+    """Create the coming months' partitions.
+
+    Schedule it daily, for example from cron (0 3 * * *). The web server
+    runs it too, but only when it starts.
+    """
+    for partition in ensure_monthly_partitions(months_ahead):
+        click.echo(partition)
+
+
+@archive_cli.command('notifications')
+@click.option('--days', default=90, show_default=True, help='Archive read notifications older than this.')
+@click.option('--batch-size', default=1000, show_default=True)
+@click.option('--output-dir', default=None, help='Export to gzipped JSONL here instead of the archive table.')
+def notifications_command(days, batch_size, output_dir):
+    moved = archive_read_notifications(days, batch_size, output_dir,
+                                       progress=lambda count: click.echo(f'archived {count} notifications'))
+    click.echo(f'done, {moved} notifications archived')
+
+
+@archive_cli.command('conversations')
+@click.option('--days', default=180, show_default=True, help='Archive conversations closed longer than this.')
+@click.option('--batch-size', default=1000, show_default=True)
+@click.option('--output-dir', default=None, help='Export to gzipped JSONL here instead of the archive table.')
+def conversations_command(days, batch_size, output_dir):
+    moved = archive_closed_conversations(days, batch_size, output_dir,
+                                         progress=lambda count: click.echo(f'archived {count} messages'))
+    click.echo(f'done, {moved} messages archived')
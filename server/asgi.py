@@ -0,0 +1,213 @@
+"""Async sibling of app.py for the read-heavy and I/O-bound endpoints.
+
+Serves the same URLs and responses as the Flask app, but on SQLAlchemy's
+asyncio engine so a slow query only parks a coroutine instead of a whole
+worker. Run it next to (or instead of) gunicorn for these routes:
+
+    uvicorn asgi:app --workers 4 --port 5556
+"""
+import os
+from contextlib import asynccontextmanager
+from functools import lru_cache, wraps
+
+import jwt
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from config import Config
+from geocoding import resolve_coordinates
+from extensions import identity_user_id
+from messaging import conversation_summary
+from models import User, MovingDetail, Notification, Conversation, RevokedToken
+from pricing import HOME_SIZES, quote
+from revocation import RevocationStore
+
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_database_url(url):
+    scheme, rest = url.split('://', 1)
+    return ASYNC_DRIVERS.get(scheme, scheme) + '://' + rest
+
+
+engine_options = {}
+if not Config.SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+    engine_options = {
+        'pool_size': int(os.environ.get('ASYNC_POOL_SIZE', 20)),
+        'max_overflow': int(os.environ.get('ASYNC_MAX_OVERFLOW', 10)),
+    }
+engine = create_async_engine(async_database_url(Config.SQLALCHEMY_DATABASE_URI), **engine_options)
+Session = async_sessionmaker(engine, expire_on_commit=False)
+revocations = RevocationStore(Config.JWT_REVOCATION_CAPACITY, Config.JWT_REVOCATION_REFRESH_SECONDS,
+                              overlap=Config.JWT_REVOCATION_OVERLAP_SECONDS)
+
+
+async def is_revoked(jti):
+    # Same checks as RevocationStore.is_revoked, on the async engine
+    if revocations.needs_refresh():
+        if revocations.needs_rebuild():
+            revocations.reset()
+        async with Session() as session:
+            rows = (await session.execute(revocations.pending())).all()
+        revocations.apply(rows)
+    if jti not in revocations.bloom:
+        return False
+    async with Session() as session:
+        return await session.scalar(select(RevokedToken.id).filter_by(jti=jti)) is not None
+
+
+def jwt_required(handler):
+    # Same token format and error responses as flask_jwt_extended
+    @wraps(handler)
+    async def wrapper(request):
+        header = request.headers.get('Authorization', '')
+        if not header.startswith('Bearer '):
+            return JSONResponse({'msg': 'Missing Authorization Header'}, status_code=401)
+        try:
+            payload = jwt.decode(header[len('Bearer '):], Config.JWT_SECRET_KEY, algorithms=['HS256'])
+        except jwt.ExpiredSignatureError:
+            return JSONResponse({'msg': 'Token has expired'}, status_code=401)
+        except jwt.PyJWTError as e:
+            return JSONResponse({'msg': str(e)}, status_code=422)
+        if payload.get('type') != 'access':
+            return JSONResponse({'msg': 'Only non-refresh tokens are allowed'}, status_code=422)
+        if await is_revoked(payload['jti']):
+            return JSONResponse({'msg': 'Token has been revoked'}, status_code=401)
+
+        # Deleted and purged accounts are turned away like Flask's user lookup does
+        async with Session() as session:
+            user = await session.get(User, identity_user_id(payload['sub']))
+        if user is None or user.deleted_at is not None:
+            return JSONResponse({'msg': f'Error loading the user {payload["sub"]}'}, status_code=401)
+
+        request.state.user = user
+        return await handler(request)
+    return wrapper
+
+
+@jwt_required
+async def moving_list(request):
+    current_user = request.state.user
+    if current_user.user_type != 'customer':
+        return JSONResponse({'message': 'Access denied'}, status_code=403)
+
+    async with Session() as session:
+        details = (await session.scalars(select(MovingDetail).filter_by(user_id=current_user.id))).all()
+
+    if not details:
+        return JSONResponse({'message': 'No moving details found'}, status_code=404)
+    return JSONResponse([detail.to_dict() for detail in details])
+
+
+def notifications_for(user_type):
+    @jwt_required
+    async def notifications(request):
+        current_user = request.state.user
+        if current_user.user_type != user_type:
+            return JSONResponse({'message': 'Access denied'}, status_code=403)
+
+        async with Session() as session:
+            notifications = (await session.scalars(
+                select(Notification).filter_by(user_id=current_user.id))).all()
+
+        return JSONResponse([notification.to_dict() for notification in notifications])
+    return notifications
+
+
+@jwt_required
+async def conversation_list(request):
+    try:
+        page = max(int(request.query_params.get('page', 1)), 1)
+        per_page = min(max(int(request.query_params.get('per_page', 20)), 1), 100)
+    except ValueError:
+        page, per_page = 1, 20
+
+    current_user = request.state.user
+    is_admin = current_user.user_type == 'admin'
+    column = Conversation.admin_id if is_admin else Conversation.customer_id
+    async with Session() as session:
+        conversations = (await session.scalars(
+            select(Conversation).where(column == current_user.id)
+            .order_by(Conversation.last_message_at.desc(), Conversation.id.desc())
+            .limit(per_page).offset((page - 1) * per_page)
+        )).all()
+
+    return JSONResponse({
+        'page': page,
+        'per_page': per_page,
+        'conversations': [conversation_summary(conversation, is_admin) for conversation in conversations]
+    })
+
+
+@lru_cache(maxsize=None)
+def flask_app():
+    from app import create_app
+    return create_app({'MIGRATIONS_ENABLED': False}, with_api=False)
+
+
+def geocode_ends(*args):
+    # The geocoder and its cache table are synchronous, so they run on a
+    # worker thread inside the Flask app, sharing its caches and provider
+    from models import db
+    with flask_app().app_context():
+        points = resolve_coordinates(*args)
+        db.session.commit()
+    return points
+
+
+@jwt_required
+async def moving_quote(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return JSONResponse({'message': 'Expected a JSON object'}, status_code=400)
+
+    try:
+        coordinates = [float(data[key]) if data.get(key) is not None else None
+                       for key in ('from_lat', 'from_lon', 'to_lat', 'to_lon')]
+    except (TypeError, ValueError):
+        return JSONResponse({'message': 'Invalid coordinates'}, status_code=400)
+
+    if None in coordinates:
+        from_point, to_point = await run_in_threadpool(
+            geocode_ends, data.get('from_location'), coordinates[0], coordinates[1],
+            data.get('to_location'), coordinates[2], coordinates[3])
+    else:
+        from_point, to_point = tuple(coordinates[:2]), tuple(coordinates[2:])
+    if not from_point or not to_point:
+        return JSONResponse({'message': 'Provide coordinates or a known location for both ends of the move'},
+                            status_code=400)
+
+    home_size = str(data.get('home_size', '')).lower()
+    if home_size not in HOME_SIZES:
+        return JSONResponse({'message': 'Invalid home size'}, status_code=400)
+
+    return JSONResponse(quote(*from_point, *to_point, home_size, bool(data.get('packing_service'))))
+
+
+routes = [
+    Route('/moving', moving_list),
+    Route('/moving/quote', moving_quote, methods=['POST']),
+    Route('/user/notifications', notifications_for('customer')),
+    Route('/admin/notifications', notifications_for('admin')),
+    Route('/conversations', conversation_list),
+]
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await engine.dispose()
+
+
+app = Starlette(routes=routes, lifespan=lifespan)
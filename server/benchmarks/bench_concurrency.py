@@ -0,0 +1,102 @@
+"""Compare concurrent-connection throughput of the sync and async servers.
+
+Start both servers against the same database, then for example:
+
+    gunicorn -c gunicorn.conf.py -w 4
+    uvicorn asgi:app --workers 4 --port 5556
+    python benchmarks/bench_concurrency.py --token <jwt> --path /user/notifications \\
+        --target sync=http://localhost:5555 --target async=http://localhost:5556
+
+Only the standard library is used so the numbers are not skewed by the client.
+"""
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def worker(base_url, method, path, headers, body, deadline, latencies, errors, lock):
+    url = urlsplit(base_url)
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    local_latencies = []
+    local_errors = 0
+
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 500:
+                local_errors += 1
+            else:
+                local_latencies.append(time.perf_counter() - started)
+        except (OSError, http.client.HTTPException):
+            local_errors += 1
+            connection.close()
+            connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+
+    connection.close()
+    with lock:
+        latencies.extend(local_latencies)
+        errors[0] += local_errors
+
+
+def run(base_url, method, path, headers, body, concurrency, duration):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    threads = [
+        threading.Thread(target=worker, args=(base_url, method, path, headers, body, deadline, latencies, errors, lock))
+        for _ in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    percentile = lambda p: latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000 if latencies else 0
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': len(latencies) / duration,
+        'mean_ms': statistics.mean(latencies) * 1000 if latencies else 0,
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', action='append', required=True, help='name=base_url, repeatable')
+    parser.add_argument('--path', default='/user/notifications')
+    parser.add_argument('--method', default='GET')
+    parser.add_argument('--data', default=None, help='JSON request body')
+    parser.add_argument('--token', default=None)
+    parser.add_argument('--concurrency', type=int, action='append', help='repeatable, default 1/10/50/100')
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+
+    headers = {'Content-Type': 'application/json'}
+    if args.token:
+        headers['Authorization'] = f'Bearer {args.token}'
+    body = json.dumps(json.loads(args.data)) if args.data else None
+
+    print(f'{"target":<10}{"conns":>7}{"req/s":>10}{"mean ms":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"errors":>8}')
+    for concurrency in args.concurrency or [1, 10, 50, 100]:
+        for target in args.target:
+            name, base_url = target.split('=', 1)
+            result = run(base_url, args.method, args.path, headers, body, concurrency, args.duration)
+            print(f'{name:<10}{concurrency:>7}{result["rps"]:>10.1f}{result["mean_ms"]:>10.1f}'
+                  f'{result["p50_ms"]:>10.1f}{result["p95_ms"]:>10.1f}{result["p99_ms"]:>10.1f}{result["errors"]:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Track worker cold-start cost: import time, create_app() and first request.
+
+Every run happens in a fresh interpreter, the way a new gunicorn worker or an
+autoscaled instance starts. Medians are printed and can be compared against a
+stored baseline:
+
+    python benchmarks/bench_startup.py --runs 10 --save benchmarks/startup_baseline.json
+    python benchmarks/bench_startup.py --baseline benchmarks/startup_baseline.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r'''
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app({'MIGRATIONS_ENABLED': %(migrations)s}, with_api=%(with_api)s)
+created = time.perf_counter()
+response = app.test_client().get('/')
+served = time.perf_counter()
+json.dump({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - created) * 1000,
+    'total_ms': (served - started) * 1000,
+    'modules': len(sys.modules),
+}, sys.stdout)
+'''
+
+METRICS = ('import_ms', 'create_app_ms', 'first_request_ms', 'total_ms', 'modules')
+
+
+def probe(with_api, migrations):
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', 'sqlite://')
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE % {'with_api': with_api, 'migrations': migrations}],
+        cwd=SERVER_DIR, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+def measure(runs):
+    results = {}
+    # api: a serving worker (wsgi.py), cli: migrations, seed.py and jobs
+    for name, with_api, migrations in (('api', True, False), ('cli', False, True)):
+        samples = [probe(with_api, migrations) for _ in range(runs)]
+        results[name] = {metric: statistics.median(sample[metric] for sample in samples) for metric in METRICS}
+    return results
+
+
+def slowest_imports(limit):
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import wsgi'],
+        cwd=SERVER_DIR, env={**os.environ, 'DATABASE_URL': os.environ.get('DATABASE_URL', 'sqlite://')},
+        check=True, capture_output=True, text=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, module = [part.strip() for part in line[len('import time:'):].split('|')]
+        rows.append((int(cumulative_us), module))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--baseline', help='fail if any timing regresses past this stored result')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed regression, default 25%%')
+    parser.add_argument('--save', help='write the result as a new baseline')
+    parser.add_argument('--imports', type=int, default=0, help='also list the N slowest imports')
+    args = parser.parse_args()
+
+    results = measure(args.runs)
+    for name, metrics in results.items():
+        print(f'{name:<4} ' + '  '.join(f'{metric}={value:.1f}' for metric, value in metrics.items()))
+
+    if args.imports:
+        print()
+        for cumulative_us, module in slowest_imports(args.imports):
+            print(f'{cumulative_us / 1000:>8.1f} ms  {module}')
+
+    if args.save:
+        with open(args.save, 'w') as fh:
+            json.dump(results, fh, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        regressions = [
+            f'{name}.{metric}: {results[name][metric]:.1f} vs {value:.1f}'
+            for name, metrics in baseline.items()
+            for metric, value in metrics.items()
+            if metric.endswith('_ms') and results[name][metric] > value * (1 + args.tolerance)
+        ]
+        if regressions:
+            print('startup regressed:\n  ' + '\n  '.join(regressions))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
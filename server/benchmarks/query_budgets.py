@@ -0,0 +1,264 @@
+"""Per-endpoint SQL budgets, checked against a freshly seeded database.
+
+Every case is requested through the test client. The script counts the SQL
+statements each request runs and the rows it fetches. It fails when a case
+goes over its declared budget, which catches N+1 loops and stray lookups
+before they ship. Request timings can also be compared with a baseline, saved
+on the same machine (timings do not carry over, so it is not committed):
+
+    python benchmarks/query_budgets.py --save benchmarks/query_baseline.json
+    python benchmarks/query_budgets.py --baseline benchmarks/query_baseline.json
+    python benchmarks/query_budgets.py --case inventory --verbose
+
+The database is a temporary SQLite file unless --database points at another,
+which must be empty: the cases refer to the seeded rows by id.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+STATS = {'queries': 0, 'rows': 0, 'statements': []}
+
+
+class CountingCursor:
+    """Wraps a DBAPI cursor to count the rows fetched through it, whatever the
+    driver."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            STATS['rows'] += 1
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._cursor.fetchmany(*args)
+        STATS['rows'] += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        STATS['rows'] += len(rows)
+        return rows
+
+
+# (name, method, path, user, request kwargs, max queries, max rows). Rows include
+# the current user's. kwargs may be a callable taking the run number, for
+# requests that must differ between runs. Reads go first so their row counts
+# do not depend on what the writes added
+CASES = [
+    ('home', 'GET', '/', None, {}, 0, 0),
+    ('user info', 'GET', '/user/info', 'customer', {}, 1, 1),
+    ('inventory', 'GET', '/inventory', 'customer', {}, 2, 51),
+    ('moving', 'GET', '/moving', 'customer', {}, 2, 22),
+    ('notifications', 'GET', '/user/notifications', 'customer', {}, 2, 102),
+    ('notifications archived', 'GET', '/user/notifications?include_archived=1', 'customer', {}, 2, 102),
+    ('admin notifications', 'GET', '/admin/notifications', 'admin', {}, 2, 101),
+    ('conversations', 'GET', '/conversations', 'customer', {}, 2, 2),
+    ('admin conversations', 'GET', '/conversations?per_page=50', 'admin', {}, 2, 32),
+    ('admin messages', 'GET', '/admin/messages?per_page=50', 'admin', {}, 2, 51),
+    ('admin customers', 'GET', '/admin/customers', 'admin', {}, 2, 32),
+    ('admin customer inventory', 'GET', '/admin/customer/1/inventory', 'admin', {}, 2, 51),
+    ('conversation messages', 'GET', '/conversations/1/messages', 'customer', {}, 3, 53),
+    ('login', 'POST', '/login', None, {'json': {'login': 'johnkamau', 'password': 'John@123'}}, 1, 1),
+    ('signup', 'POST', '/signup', None, lambda i: {'json': {
+        'first_name': 'Budget', 'surname': 'Case', 'username': f'budget{i}', 'email': f'budget{i}@example.com',
+        'phone_number': f'7{i:08d}', 'gender': 'female', 'date_of_birth': '1995-06-01', 'password': 'Budget@123'}},
+     3, 1),
+    ('user update', 'PUT', '/user/update', 'customer', lambda i: {'json': {'location': f'Westlands {i}'}}, 2, 1),
+    ('inventory add', 'POST', '/inventory/add', 'customer', {'data': {
+        'item_name': 'Box', 'quantity': '2', 'description': 'Books', 'category': 'Misc', 'condition': 'Used'}}, 2, 1),
+    ('inventory update', 'PUT', '/inventory/update/1', 'customer', lambda i: {'json': {'quantity': i + 2}}, 3, 2),
+    ('moving add', 'POST', '/moving/add', 'customer', {'data': {
+        'from_location': 'Westlands, Nairobi', 'to_location': 'Nakuru', 'home_size': 'bedsitter',
+        'moving_date': (datetime.utcnow() + timedelta(days=30)).strftime('%Y-%m-%d %H:%M:%S'),
+        # price is required by the form but always recomputed
+        'price': '1', 'packing_service': 'y'}}, 2, 2),
+    ('moving quote', 'POST', '/moving/quote', 'customer', {'json': {
+        'from_location': 'Nairobi', 'to_location': 'Mombasa', 'home_size': 'one bedroom'}}, 1, 1),
+    ('conversation reply', 'POST', '/conversations/1/messages', 'customer', {'json': {'content': 'Any update?'}}, 4, 2),
+    ('conversation read', 'POST', '/conversations/1/read', 'customer', {}, 3, 2),
+    ('notifications read', 'POST', '/user/notifications/read', 'customer', {}, 2, 1),
+    ('send message', 'POST', '/send-message', 'customer', {'json': {'content': 'Hello again'}}, 4, 2),
+    ('admin status update', 'PUT', '/admin/moving/update-status/1', 'admin', lambda i: {'json': {
+        'status': 'approved' if i % 2 == 0 else 'pending'}}, 4, 3),
+    ('admin bulk status', 'PUT', '/admin/moving/update-status', 'admin', lambda i: {'json': {
+        'status': 'approved' if i % 2 == 0 else 'pending',
+        'items': [{'id': moving_id, 'version': i + 1} for moving_id in range(2, 12)]}}, 3, 11),
+]
+
+
+def seed(app):
+    from seed import seed_data
+    from messaging import get_or_create_conversation, post_message
+    from models import db, User, Inventory, MovingDetail, Notification
+
+    seed_data(app)
+    with app.app_context():
+        customer = User.query.filter_by(username='johnkamau').one()
+        admin = User.query.filter_by(username='gichachu').one()
+
+        # Enough rows that a per-row query shows up as a budget overrun
+        for i in range(49):
+            db.session.add(Inventory(user_id=customer.id, item_name=f'Item {i}', quantity=1,
+                                     description='Seeded', category='Misc', condition='Used'))
+        for i in range(20):
+            db.session.add(MovingDetail(user_id=customer.id, from_location='Nairobi', to_location='Thika',
+                                        from_lat=-1.2921, from_lon=36.8219, to_lat=-1.0388, to_lon=37.0834,
+                                        home_size='bedsitter', moving_date=datetime.utcnow() + timedelta(days=i + 1),
+                                        price=5000, packing_service=False, status='pending'))
+        for i in range(100):
+            db.session.add(Notification(user_id=customer.id, message=f'Notification {i}'))
+            db.session.add(Notification(user_id=admin.id, message=f'Notification {i}'))
+        for i in range(30):
+            other = User(first_name='Seeded', surname=f'Customer{i}', username=f'seeded{i}',
+                         email=f'seeded{i}@example.com', phone_number=f'6{i:08d}', gender='male',
+                         user_type='customer')
+            other.password = 'Seeded@123'
+            db.session.add(other)
+            db.session.flush()
+            post_message(get_or_create_conversation(other.id), other.id, 'Hello')
+        conversation = get_or_create_conversation(customer.id)
+        for i in range(50):
+            post_message(conversation, admin.id if i % 2 else customer.id, f'Message {i}')
+        db.session.commit()
+        return {'customer': customer.id, 'admin': admin.id}
+
+
+def create_budget_app(database_url):
+    from app import create_app
+    from sqlalchemy import event
+    from models import db
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'MIGRATIONS_ENABLED': False,
+        'WTF_CSRF_ENABLED': False,
+        'RATELIMIT_ENABLED': False,
+        'LOAD_SHED_QUEUE_MS': 0,
+        'PURGE_IN_BACKGROUND': False,
+        # One refresh while warming up, none while measuring
+        'JWT_REVOCATION_REFRESH_SECONDS': 3600,
+    })
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            # A scratch database: waiting on the disk at every commit only adds
+            # noise to the timings
+            @event.listens_for(db.engine, 'connect')
+            def no_sync(dbapi_connection, connection_record):
+                dbapi_connection.execute('PRAGMA synchronous=OFF')
+
+            db.engine.dispose()
+        db.create_all()
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def count_query(connection, cursor, statement, parameters, context, executemany):
+            STATS['queries'] += 1
+            STATS['statements'].append(statement)
+
+        @event.listens_for(db.engine, 'after_cursor_execute')
+        def count_rows(connection, cursor, statement, parameters, context, executemany):
+            # The result fetches from the context's cursor, so rows are counted
+            # however the driver returns them. Keys handed back by INSERT ..
+            # RETURNING are not counted: only some drivers fetch them as rows
+            if not (context.isinsert or context.isupdate or context.isdelete):
+                context.cursor = CountingCursor(cursor)
+    return app
+
+
+def run_case(client, case, headers, runs):
+    name, method, path, user, kwargs, max_queries, max_rows = case
+    samples = []
+    for i in range(runs + 1):
+        request_kwargs = kwargs(i) if callable(kwargs) else kwargs
+        STATS.update(queries=0, rows=0, statements=[])
+        started = time.perf_counter()
+        response = client.open(path, method=method, headers=headers.get(user, {}), **request_kwargs)
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code >= 400:
+            raise RuntimeError(f'{name}: {method} {path} returned {response.status_code} {response.get_data(as_text=True)}')
+        # The first request warms caches (revocations, geocoder, forms import) and is not counted
+        if i:
+            samples.append((elapsed, STATS['queries'], STATS['rows'], list(STATS['statements'])))
+    return {
+        'median_ms': statistics.median(sample[0] for sample in samples),
+        'queries': max(sample[1] for sample in samples),
+        'rows': max(sample[2] for sample in samples),
+        'statements': max(samples, key=lambda sample: sample[1])[3],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--database', help='URL of an empty database to seed, default a temporary SQLite file')
+    parser.add_argument('--case', help='only run cases whose name contains this')
+    parser.add_argument('--baseline', help='fail if any case got slower than this stored result')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed slowdown, default 50%%')
+    parser.add_argument('--min-ms', type=float, default=1.0, help='ignore slowdowns smaller than this')
+    parser.add_argument('--save', help='write the result as a new baseline')
+    parser.add_argument('--verbose', action='store_true', help='print the SQL of each case')
+    args = parser.parse_args()
+
+    from flask_jwt_extended import create_access_token
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_budget_app(args.database or f'sqlite:///{os.path.join(directory, "budgets.sqlite")}')
+        users = seed(app)
+        with app.app_context():
+            headers = {role: {'Authorization': 'Bearer ' + create_access_token(identity=user_id)}
+                       for role, user_id in users.items()}
+        client = app.test_client()
+
+        results = {}
+        failures = []
+        for case in CASES:
+            name, max_queries, max_rows = case[0], case[5], case[6]
+            if args.case and args.case not in name:
+                continue
+            result = results[name] = run_case(client, case, headers, args.runs)
+            over = result['queries'] > max_queries or result['rows'] > max_rows
+            print(f'{"OVER" if over else "ok":<5}{name:<28} queries {result["queries"]:>3}/{max_queries:<3} '
+                  f'rows {result["rows"]:>4}/{max_rows:<4} {result["median_ms"]:>7.2f} ms')
+            if args.verbose or over:
+                for statement in result['statements']:
+                    print('       ' + ' '.join(statement.split())[:160])
+            if over:
+                failures.append(f'{name}: {result["queries"]} queries / {result["rows"]} rows, '
+                                f'budget {max_queries} / {max_rows}')
+
+    if args.save:
+        with open(args.save, 'w') as fh:
+            json.dump({name: {key: value for key, value in result.items() if key != 'statements'}
+                       for name, result in results.items()}, fh, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            before = baseline[name]['median_ms']
+            if result['median_ms'] > before * (1 + args.tolerance) and result['median_ms'] - before > args.min_ms:
+                failures.append(f'{name}: {result["median_ms"]:.2f} ms vs {before:.2f} ms')
+
+    if failures:
+        print('over budget:\n  ' + '\n  '.join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+import csv
+import io
+import json
+import sys
+import zlib
+from datetime import date, datetime
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import exists, select
+
+from models import db, User, Inventory, MovingDetail
+
+YIELD_PER = 1000
+CHUNK_ROWS = 500
+
+def _owner_not_deleted(user_column):
+    # Deleted customers' rows stay until the purge job gets to them, but must
+    # not be exported in the meantime
+    return ~exists().where(User.id == user_column, User.deleted_at.isnot(None))
+
+
+DATASETS = {
+    'customers': {
+        'columns': [User.id, User.first_name, User.second_name, User.surname, User.username, User.email,
+                    User.phone_number, User.gender, User.location, User.date_of_birth],
+        'criteria': [User.user_type == 'customer', User.deleted_at.is_(None)],
+        'user_column': User.id,
+    },
+    'inventory': {
+        'columns': [Inventory.id, Inventory.user_id, Inventory.item_name, Inventory.quantity,
+                    Inventory.description, Inventory.category, Inventory.condition],
+        'criteria': [_owner_not_deleted(Inventory.user_id)],
+        'user_column': Inventory.user_id,
+    },
+    'moves': {
+        'columns': [MovingDetail.id, MovingDetail.user_id, MovingDetail.from_location, MovingDetail.to_location,
+                    MovingDetail.home_size, MovingDetail.moving_date, MovingDetail.price,
+                    MovingDetail.packing_service, MovingDetail.status, MovingDetail.additional_details],
+        'criteria': [_owner_not_deleted(MovingDetail.user_id)],
+        'user_column': MovingDetail.user_id,
+        'date_column': MovingDetail.moving_date,
+        'status_column': MovingDetail.status,
+    },
+}
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def build_export_query(dataset, date_from=None, date_to=None, status=None, user_id=None):
+    if dataset not in DATASETS:
+        raise ExportError(f'Unknown dataset {dataset}')
+    spec = DATASETS[dataset]
+
+    query = select(*spec['columns']).where(*spec.get('criteria', []))
+    if date_from or date_to:
+        if 'date_column' not in spec:
+            raise ExportError(f'{dataset} cannot be filtered by date')
+        if date_from:
+            query = query.where(spec['date_column'] >= date_from)
+        if date_to:
+            query = query.where(spec['date_column'] < date_to)
+    if status:
+        if 'status_column' not in spec:
+            raise ExportError(f'{dataset} cannot be filtered by status')
+        query = query.where(spec['status_column'] == status)
+    if user_id:
+        query = query.where(spec['user_column'] == user_id)
+
+    # Ordered by primary key so the server-side cursor walks the index
+    return query.order_by(spec['columns'][0]).execution_options(yield_per=YIELD_PER)
+
+
+def iter_rows(query):
+    for row in db.session.execute(query):
+        yield row
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def jsonl_line(row):
+    return json.dumps(dict(row._mapping), default=_json_default) + '\n'
+
+
+def jsonl_chunks(rows):
+    lines = []
+    for row in rows:
+        lines.append(jsonl_line(row))
+        if len(lines) >= CHUNK_ROWS:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def csv_chunks(columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.key for column in columns])
+
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def gzip_chunks(chunks):
+    # wbits=31 writes a gzip header, so the output is a regular .gz file
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(dataset, fmt='csv', compress=False, **filters):
+    if fmt not in FORMATS:
+        raise ExportError(f'Unknown format {fmt}')
+
+    query = build_export_query(dataset, **filters)
+    rows = iter_rows(query)
+    if fmt == 'csv':
+        chunks = csv_chunks(DATASETS[dataset]['columns'], rows)
+    else:
+        chunks = jsonl_chunks(rows)
+
+    if compress:
+        return gzip_chunks(chunks)
+    return (chunk.encode('utf-8') for chunk in chunks)
+
+
+def export_filename(dataset, fmt, compress):
+    return f'{dataset}-{datetime.utcnow():%Y%m%d%H%M%S}.{fmt}' + ('.gz' if compress else '')
+
+
+export_cli = AppGroup('export', help='Stream customers, inventory or moves to CSV/JSONL.')
+
+
+@export_cli.command('run')
+@click.argument('dataset', type=click.Choice(sorted(DATASETS)))
+@click.option('--format', 'fmt', type=click.Choice(sorted(FORMATS)), default='csv', show_default=True)
+@click.option('--gzip', 'compress', is_flag=True, help='Compress the output on the fly.')
+@click.option('--from', 'date_from', type=click.DateTime(formats=['%Y-%m-%d']), default=None)
+@click.option('--to', 'date_to', type=click.DateTime(formats=['%Y-%m-%d']), default=None)
+@click.option('--status', default=None)
+@click.option('--user-id', type=int, default=None)
+@click.option('--output', '-o', type=click.Path(dir_okay=False), default=None, help='Defaults to stdout.')
+def export_command(dataset, fmt, compress, date_from, date_to, status, user_id, output):
+    try:
+        chunks = stream_export(dataset, fmt, compress, date_from=date_from, date_to=date_to,
+                               status=status, user_id=user_id)
+        out = open(output, 'wb') if output else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+        finally:
+            if output:
+                out.close()
+    except ExportError as e:
+        raise click.UsageError(str(e))
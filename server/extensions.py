@@ -0,0 +1,24 @@
+from flask_cors import CORS
+from flask_jwt_extended import JWTManager, get_jwt_identity
+
+jwt = JWTManager()
+cors = CORS()
+
+
+def identity_user_id(identity):
+    # Older tokens carry {'id': ...} instead of the plain id
+    if isinstance(identity, dict):
+        identity = identity.get('id')
+    try:
+        return int(identity)
+    except (TypeError, ValueError):
+        return None
+
+
+def current_user_id():
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:
+        # No verified token (yet) in this request
+        return None
+    return identity_user_id(identity)
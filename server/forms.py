@@ -0,0 +1,77 @@
+import datetime
+from datetime import timedelta
+
+from flask_wtf import FlaskForm
+from wtforms import StringField, PasswordField, BooleanField, SelectField, DateField, IntegerField, DateTimeField, FloatField
+from wtforms.validators import DataRequired, Email, EqualTo, Length, Optional, Regexp, ValidationError, NumberRange
+
+class SignupForm(FlaskForm):
+    first_name = StringField('First Name', validators=[DataRequired()])
+    second_name = StringField('Second Name')
+    surname = StringField('Surname', validators=[DataRequired()])
+    username = StringField('Username', validators=[DataRequired()])
+    email = StringField('Email', validators=[DataRequired(), Email()])
+    phone_number = StringField('Phone Number', validators=[DataRequired()])
+    gender = SelectField('Gender', choices=[('male', 'Male'), ('female', 'Female')], validators=[DataRequired()])
+    date_of_birth = DateField('Date of Birth', validators=[DataRequired()])
+    password = PasswordField('Password', validators=[
+        DataRequired(),
+        Regexp('^(?=.*[a-z])(?=.*[A-Z])(?=.*[0-9])(?=.*[!@#$%^&*]).{8,}$', 
+               message="Password should have at least one lowercase, one uppercase, one number, and one special character.")
+    ])
+    confirm_password = PasswordField('Confirm Password', validators=[
+        DataRequired(),
+        EqualTo('password', message='Passwords must match.')
+    ])
+    accept_terms = BooleanField('I accept the Terms and Conditions', validators=[DataRequired()])
+
+    def validate_date_of_birth(form, field):
+        if field.data:
+            today = datetime.date.today()
+            age = today.year - field.data.year - ((today.month, today.day) < (field.data.month, field.data.day))
+            if age < 18:
+                raise ValidationError('You must be at least 18 years old to register.')
+            
+    def validate_phone_number(form, field):
+        if field.data:
+            if not field.data.isdigit() or len(field.data) != 9:
+                raise ValidationError('Phone number must be exactly 9 digits.')
+
+class LoginForm(FlaskForm):
+    login = StringField('Username/Email/Phone', validators=[DataRequired()])
+    password = PasswordField('Password', validators=[DataRequired()])
+
+class InventoryForm(FlaskForm):
+    item_name = StringField('Item Name', validators=[DataRequired()])
+    quantity = IntegerField('Quantity', validators=[DataRequired(), NumberRange(min=1)])
+    description = StringField('Description', validators=[DataRequired()]) 
+    category = StringField('Category', validators=[DataRequired()]) 
+    condition = StringField('Condition', validators=[DataRequired()])
+
+class MovingDetailForm(FlaskForm):
+    from_location = StringField('From Location', validators=[DataRequired()])
+    # Coordinates are optional, missing ones are geocoded from the location names
+    from_lat = FloatField('From Latitude', validators=[Optional()])
+    from_lon = FloatField('From Longitude', validators=[Optional()])
+    to_location = StringField('To Location', validators=[DataRequired()])
+    to_lat = FloatField('To Latitude', validators=[Optional()])
+    to_lon = FloatField('To Longitude', validators=[Optional()])
+    home_size = SelectField('Home Size', choices=[
+        ('bedsitter', 'Bedsitter'),
+        ('one bedroom', 'One Bedroom'),
+        ('studio', 'Studio'),
+        ('two bedroom', 'Two Bedroom')
+    ], validators=[DataRequired()])
+    moving_date = DateTimeField('Moving Date', validators=[DataRequired()], format='%Y-%m-%d %H:%M:%S')
+    price = FloatField('Price', validators=[DataRequired()])
+    packing_service = BooleanField('Packing Service')
+    additional_details = StringField('Additional Details')
+
+    @staticmethod
+    def validate_moving_date(form, field):
+        if field.data:
+            min_date = datetime.datetime.now() + timedelta(days=7)
+            if field.data < datetime.datetime.now():
+                raise ValidationError('Moving date cannot be in the past.')
+            elif field.data < min_date:
+                raise ValidationError('Moving date should be at least 7 days from today.')
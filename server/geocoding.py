@@ -0,0 +1,234 @@
+import csv
+import difflib
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from models import db, GeocodeCache
+
+DEFAULT_GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'gazetteer.csv')
+
+# Words that do not change where a place is
+FILLER_WORDS = {'kenya', 'ke', 'county', 'city', 'town', 'estate', 'area', 'road', 'rd'}
+
+
+def location_tokens(name):
+    name = unicodedata.normalize('NFKD', name or '').encode('ascii', 'ignore').decode('ascii').lower()
+    return [token for token in re.split(r'[^a-z0-9]+', name) if token and token not in FILLER_WORDS]
+
+
+def normalize_location(name):
+    # Sorted, de-duplicated tokens: "Westlands, Nairobi" and "nairobi  westlands" share a key
+    return ' '.join(sorted(set(location_tokens(name))))
+
+
+def cache_key(name):
+    # Hashed, so a location of any length fits the key column
+    normalized = normalize_location(name)
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest() if normalized else ''
+
+
+class GeocodingProvider:
+    name = None
+
+    def geocode(self, location):
+        raise NotImplementedError
+
+    def geocode_many(self, locations):
+        return {location: self.geocode(location) for location in locations}
+
+
+class GazetteerProvider(GeocodingProvider):
+    """Resolves locations from a local CSV of ``name,lat,lon`` rows.
+
+    Used offline and in tests. A location matches on its full name, then on
+    its most specific part ("Westlands, Nairobi" -> Westlands), then on the
+    closest spelling.
+    """
+    name = 'gazetteer'
+
+    def __init__(self, path=DEFAULT_GAZETTEER_PATH):
+        self.places = {}
+        with open(path, newline='', encoding='utf-8') as fh:
+            for row in csv.DictReader(fh):
+                self.places[' '.join(location_tokens(row['name']))] = (float(row['lat']), float(row['lon']))
+
+    def geocode(self, location):
+        tokens = location_tokens(location)
+        if not tokens:
+            return None
+
+        candidates = [' '.join(tokens)]
+        # Longest runs first, in the order they were written
+        for size in range(len(tokens) - 1, 0, -1):
+            candidates.extend(' '.join(tokens[i:i + size]) for i in range(len(tokens) - size + 1))
+
+        for candidate in candidates:
+            if candidate in self.places:
+                return self.places[candidate]
+        for candidate in candidates:
+            matches = difflib.get_close_matches(candidate, self.places.keys(), n=1, cutoff=0.85)
+            if matches:
+                return self.places[matches[0]]
+        return None
+
+
+class GoogleMapsProvider(GeocodingProvider):
+    name = 'google'
+
+    def __init__(self, api_key, region='ke'):
+        # Imported here so processes that never geocode do not pay for it
+        import googlemaps
+        self.client = googlemaps.Client(key=api_key)
+        self.region = region
+
+    def geocode(self, location):
+        results = self.client.geocode(location, region=self.region)
+        if not results:
+            return None
+        point = results[0]['geometry']['location']
+        return point['lat'], point['lng']
+
+
+class Geocoder:
+    """Provider lookups fronted by an in-process LRU and the geocode_cache table.
+
+    Places that were found are cached for good. Places that were not are
+    asked again once they are ``negative_ttl`` old, in case the provider or
+    the gazetteer has learned them since.
+    """
+
+    def __init__(self, provider, lru_size=4096, negative_ttl=timedelta(hours=24)):
+        self.provider = provider
+        self.lru_size = lru_size
+        self.negative_ttl = negative_ttl
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _fresh(self, point, cached_at):
+        return point is not None or cached_at is None or datetime.utcnow() - cached_at < self.negative_ttl
+
+    def _lru_get(self, key):
+        with self._lock:
+            if key not in self._lru:
+                return False, None
+            point, cached_at = self._lru[key]
+            if not self._fresh(point, cached_at):
+                return False, None
+            self._lru.move_to_end(key)
+            return True, point
+
+    def _lru_put(self, key, point, cached_at):
+        with self._lock:
+            self._lru[key] = (point, cached_at)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    def geocode(self, location):
+        return self.geocode_many([location])[location]
+
+    def geocode_many(self, locations):
+        """Resolve several locations at once, returning ``{location: (lat, lon) or None}``.
+
+        Every distinct key costs at most one cache-table round trip for the
+        whole batch, and one provider call (one per ``negative_ttl`` while
+        it is not found).
+        """
+        keys = {location: cache_key(location) for location in locations}
+        resolved = {}
+        missing = {}
+        for location, key in keys.items():
+            if not key:
+                resolved[key] = None
+                continue
+            found, point = self._lru_get(key)
+            if found:
+                resolved[key] = point
+            else:
+                missing.setdefault(key, location)
+
+        stale = {}
+        if missing:
+            for row in GeocodeCache.query.filter(GeocodeCache.key.in_(list(missing))):
+                point = (row.lat, row.lon) if row.lat is not None else None
+                if not self._fresh(point, row.created_at):
+                    stale[row.key] = row
+                    continue
+                resolved[row.key] = point
+                self._lru_put(row.key, point, row.created_at)
+                del missing[row.key]
+
+        if missing:
+            points = self.provider.geocode_many(list(missing.values()))
+            now = datetime.utcnow()
+            rows = []
+            for key, location in missing.items():
+                point = points.get(location)
+                resolved[key] = point
+                self._lru_put(key, point, now)
+                if key in stale:
+                    # An expired miss, asked again
+                    row = stale[key]
+                    row.lat, row.lon = point if point else (None, None)
+                    row.provider = self.provider.name
+                    row.created_at = now
+                    continue
+                rows.append(GeocodeCache(
+                    key=key,
+                    location=location[:255],
+                    lat=point[0] if point else None,
+                    lon=point[1] if point else None,
+                    provider=self.provider.name,
+                    created_at=now
+                ))
+            try:
+                with db.session.begin_nested():
+                    db.session.add_all(rows)
+            except IntegrityError:
+                # Another worker cached the same places first, theirs are as good as ours
+                pass
+
+        return {location: resolved[key] for location, key in keys.items()}
+
+
+def create_provider(config):
+    provider = config.get('GEOCODER_PROVIDER', 'gazetteer')
+    if provider == 'google':
+        return GoogleMapsProvider(config['GOOGLE_MAPS_API_KEY'])
+    if provider == 'gazetteer':
+        return GazetteerProvider(config.get('GEOCODER_GAZETTEER_PATH') or DEFAULT_GAZETTEER_PATH)
+    raise ValueError(f'Unknown geocoding provider {provider}')
+
+
+def get_geocoder():
+    geocoder = current_app.extensions.get('geocoder')
+    if geocoder is None:
+        geocoder = Geocoder(
+            create_provider(current_app.config),
+            current_app.config.get('GEOCODER_LRU_SIZE', 4096),
+            timedelta(hours=current_app.config.get('GEOCODER_NEGATIVE_TTL_HOURS', 24))
+        )
+        current_app.extensions['geocoder'] = geocoder
+    return geocoder
+
+
+def resolve_coordinates(from_location, from_lat, from_lon, to_location, to_lat, to_lon):
+    from_point = (from_lat, from_lon) if from_lat is not None and from_lon is not None else None
+    to_point = (to_lat, to_lon) if to_lat is not None and to_lon is not None else None
+
+    # Both ends go to the geocoder in one batch
+    pending = [location for location, point in ((from_location, from_point), (to_location, to_point))
+               if point is None and location]
+    if pending:
+        results = get_geocoder().geocode_many(pending)
+        from_point = from_point or results.get(from_location)
+        to_point = to_point or results.get(to_location)
+    return from_point, to_point
@@ -0,0 +1,38 @@
+import gc
+
+bind = '0.0.0.0:5555'
+wsgi_app = 'wsgi:app'
+
+# Load the app once in the master and fork it into the workers, so a new
+# worker is ready as soon as it is forked instead of re-importing everything
+preload_app = True
+
+
+def when_ready(server):
+    # Partitions only exist a few months ahead, so every deploy tops them up
+    # in case the daily `flask archive partitions` job is not set up. The
+    # master's connections are closed before any worker is forked
+    from archive import ensure_monthly_partitions
+    from models import db
+    from wsgi import app
+    with app.app_context():
+        try:
+            ensure_monthly_partitions()
+        except Exception:
+            server.log.exception('Could not create the monthly partitions')
+        finally:
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+
+
+def pre_fork(server, worker):
+    # Keep the preloaded objects out of the collector so the workers'
+    # copy-on-write pages are not touched by gc passes
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from app import dispose_engines
+    from wsgi import app
+    dispose_engines(app)
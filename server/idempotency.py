@@ -0,0 +1,135 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+from functools import wraps
+
+import click
+from flask import current_app, request
+from flask.cli import AppGroup
+from flask_restful.utils import unpack
+from sqlalchemy.exc import IntegrityError
+
+from models import db, IdempotencyKey
+from extensions import current_user_id
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+# Worth replaying: the same request would get the same answer. Conflicts and
+# rate limits may clear up, and 5xx responses are never stored
+NOT_STORED = {409, 429}
+
+
+def request_fingerprint():
+    if request.form:
+        body = json.dumps(sorted(request.form.items(multi=True))).encode('utf-8')
+    else:
+        body = request.get_data(cache=True)
+    return hashlib.sha256(request.method.encode('utf-8') + request.path.encode('utf-8') + body).hexdigest()
+
+
+def _claim(scope, key, user_id, fingerprint):
+    now = datetime.utcnow()
+    record = IdempotencyKey(
+        scope=scope,
+        key=key,
+        user_id=user_id,
+        endpoint=request.endpoint or request.path,
+        fingerprint=fingerprint,
+        status='processing',
+        created_at=now,
+        expires_at=now + timedelta(hours=current_app.config['IDEMPOTENCY_TTL_HOURS'])
+    )
+    db.session.add(record)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return None
+    return record
+
+
+def _release_stale(scope, key):
+    # Expired keys, and claims whose request died before storing a response, are free again
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=current_app.config['IDEMPOTENCY_LOCK_SECONDS'])
+    released = IdempotencyKey.query.filter(
+        IdempotencyKey.scope == scope,
+        IdempotencyKey.key == key,
+        db.or_(IdempotencyKey.expires_at <= now,
+               db.and_(IdempotencyKey.status == 'processing', IdempotencyKey.created_at < stale))
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return released
+
+
+def idempotent(fn):
+    """Store the response of a POST under the client's ``Idempotency-Key``.
+
+    A retry with the same key and body gets the stored response back without
+    running the handler again. Keys are scoped to the user, or to the client
+    address for anonymous callers, and expire after ``IDEMPOTENCY_TTL_HOURS``.
+    Goes below ``jwt_required`` so the user is known.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return fn(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return {'message': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'}, 400
+
+        user_id = current_user_id()
+        # Anonymous callers must not replay each other's responses. The address
+        # comes from the proxy headers when PROXY_FIX_X_FOR is set, and an IPv6
+        # one still fits the scope column
+        scope = f'user:{user_id}' if user_id is not None else f'ip:{request.remote_addr}'
+        fingerprint = request_fingerprint()
+
+        record = _claim(scope, key, user_id, fingerprint)
+        if record is None and _release_stale(scope, key):
+            record = _claim(scope, key, user_id, fingerprint)
+        if record is None:
+            existing = IdempotencyKey.query.filter_by(scope=scope, key=key).first()
+            if existing is None:
+                return {'message': 'Request with this Idempotency-Key is in progress'}, 409, {'Retry-After': '1'}
+            if existing.fingerprint != fingerprint:
+                return {'message': f'{HEADER} was already used for a different request'}, 422
+            if existing.status != 'completed':
+                return {'message': 'Request with this Idempotency-Key is in progress'}, 409, {'Retry-After': '1'}
+            return existing.response_body, existing.response_code, {'Idempotent-Replayed': 'true'}
+
+        record_id = record.id
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            db.session.rollback()
+            IdempotencyKey.query.filter_by(id=record_id).delete(synchronize_session=False)
+            db.session.commit()
+            raise
+
+        # Whatever the handler left uncommitted is not ours to commit
+        db.session.rollback()
+        data, code, headers = unpack(result)
+        if code >= 500 or code in NOT_STORED or not isinstance(data, (dict, list)):
+            IdempotencyKey.query.filter_by(id=record_id).delete(synchronize_session=False)
+        else:
+            IdempotencyKey.query.filter_by(id=record_id).update({
+                IdempotencyKey.status: 'completed',
+                IdempotencyKey.response_code: code,
+                IdempotencyKey.response_body: data
+            }, synchronize_session=False)
+        db.session.commit()
+        return result
+    return wrapper
+
+
+idempotency_cli = AppGroup('idempotency', help='Stored Idempotency-Key responses.')
+
+
+@idempotency_cli.command('purge-expired')
+def purge_expired_command():
+    deleted = IdempotencyKey.query.filter(IdempotencyKey.expires_at <= datetime.utcnow()).delete(
+        synchronize_session=False)
+    db.session.commit()
+    click.echo(f'removed {deleted} expired idempotency keys')
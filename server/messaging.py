@@ -0,0 +1,127 @@
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db, User, Conversation, Message
+
+PREVIEW_LENGTH = 255
+
+
+class AdminRouter:
+    """Picks the admin a new conversation is assigned to.
+
+    The admin ids are cached for ``ttl`` seconds so sending a message does not
+    query the user table every time. New threads are spread round-robin over
+    the cached admins; existing threads stay with the admin they were given.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._admin_ids = []
+        self._loaded_at = 0
+        self._next = 0
+
+    def admin_ids(self):
+        with self._lock:
+            if not self._admin_ids or time.monotonic() - self._loaded_at > self.ttl:
+                rows = db.session.query(User.id).filter_by(user_type='admin').order_by(User.id).all()
+                self._admin_ids = [row.id for row in rows]
+                self._loaded_at = time.monotonic()
+            return list(self._admin_ids)
+
+    def next_admin_id(self):
+        admin_ids = self.admin_ids()
+        if not admin_ids:
+            return None
+        with self._lock:
+            admin_id = admin_ids[self._next % len(admin_ids)]
+            self._next += 1
+        return admin_id
+
+    def invalidate(self):
+        with self._lock:
+            self._admin_ids = []
+
+
+admin_router = AdminRouter()
+
+
+def get_or_create_conversation(customer_id):
+    conversation = Conversation.query.filter_by(customer_id=customer_id).first()
+    if conversation:
+        if conversation.admin_id is None:
+            conversation.admin_id = admin_router.next_admin_id()
+        return conversation
+
+    conversation = Conversation(customer_id=customer_id, admin_id=admin_router.next_admin_id())
+    try:
+        with db.session.begin_nested():
+            db.session.add(conversation)
+    except IntegrityError:
+        # Another request created the thread first
+        conversation = Conversation.query.filter_by(customer_id=customer_id).one()
+    return conversation
+
+
+def post_message(conversation, sender_id, content):
+    if sender_id == conversation.customer_id:
+        receiver_id = conversation.admin_id
+        unread_column = 'admin_unread'
+    else:
+        receiver_id = conversation.customer_id
+        unread_column = 'customer_unread'
+
+    now = datetime.utcnow()
+    message = Message(
+        conversation_id=conversation.id,
+        sender_id=sender_id,
+        receiver_id=receiver_id,
+        content=content,
+        created_at=now
+    )
+    db.session.add(message)
+    db.session.flush()
+
+    conversation.last_message_id = message.id
+    conversation.last_sender_id = sender_id
+    conversation.last_message_preview = content[:PREVIEW_LENGTH]
+    conversation.last_message_at = now
+    if conversation.status == 'closed':
+        conversation.status = 'open'
+        conversation.closed_at = None
+    # Incremented in SQL so concurrent senders do not lose counts
+    setattr(conversation, unread_column, getattr(Conversation, unread_column) + 1)
+    return message
+
+
+def mark_conversation_read(conversation, reader_id):
+    Message.query.filter(
+        Message.conversation_id == conversation.id,
+        Message.receiver_id == reader_id,
+        Message.read.is_(False)
+    ).update({Message.read: True}, synchronize_session=False)
+
+    if reader_id == conversation.customer_id:
+        conversation.customer_unread = 0
+    else:
+        conversation.admin_unread = 0
+
+
+def conversation_summary(conversation, viewer_is_admin):
+    return {
+        'id': conversation.id,
+        'customer_id': conversation.customer_id,
+        'admin_id': conversation.admin_id,
+        'last_message': {
+            'id': conversation.last_message_id,
+            'sender_id': conversation.last_sender_id,
+            'content': conversation.last_message_preview,
+            # Same format as the messages themselves
+            'created_at': conversation.last_message_at.strftime(Message.datetime_format)
+            if conversation.last_message_at else None
+        },
+        'unread_count': conversation.admin_unread if viewer_is_admin else conversation.customer_unread
+    }
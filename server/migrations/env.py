@@ -1,4 +1,5 @@
 import logging
+import re
 from logging.config import fileConfig
 
 from flask import current_app
@@ -45,6 +46,17 @@ target_db = current_app.extensions['migrate'].db
 # ... etc.
 
 
+# Monthly partitions of the partitioned tables (see archive.py) are created
+# at run time and are not in the models
+PARTITION_NAME = re.compile(r'^(notification|message)_(y\d{4}m\d{2}|default)$')
+
+
+def include_name(name, type_, parent_names):
+    if type_ == 'table':
+        return not PARTITION_NAME.match(name)
+    return True
+
+
 def get_metadata():
     if hasattr(target_db, 'metadatas'):
         return target_db.metadatas[None]
@@ -100,6 +112,7 @@ def run_migrations_online():
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
+            include_name=include_name,
             **conf_args
         )
 
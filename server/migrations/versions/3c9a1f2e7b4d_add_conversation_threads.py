@@ -0,0 +1,81 @@
+"""add conversation threads
+
+Revision ID: 3c9a1f2e7b4d
+Revises: 75ef5fa873fd
+Create Date: 2026-10-19 09:12:40.118302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9a1f2e7b4d'
+down_revision = '75ef5fa873fd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('conversation',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('customer_id', sa.Integer(), nullable=False),
+    sa.Column('admin_id', sa.Integer(), nullable=True),
+    sa.Column('last_message_id', sa.Integer(), nullable=True),
+    sa.Column('last_sender_id', sa.Integer(), nullable=True),
+    sa.Column('last_message_preview', sa.String(length=255), nullable=True),
+    sa.Column('last_message_at', sa.DateTime(), nullable=True),
+    sa.Column('customer_unread', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('admin_unread', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['admin_id'], ['user.id'], ),
+    sa.ForeignKeyConstraint(['customer_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('customer_id')
+    )
+    op.create_index('ix_conversation_admin_id_last_message_at', 'conversation', ['admin_id', 'last_message_at'], unique=False)
+    op.create_index(op.f('ix_conversation_last_message_at'), 'conversation', ['last_message_at'], unique=False)
+
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('conversation_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('read', sa.Boolean(), nullable=True))
+        batch_op.create_foreign_key('fk_message_conversation_id_conversation', 'conversation', ['conversation_id'], ['id'])
+        batch_op.create_index('ix_message_conversation_id_created_at', ['conversation_id', 'created_at', 'id'], unique=False)
+
+    # Group existing messages into one thread per customer
+    op.execute("""
+        INSERT INTO conversation (customer_id, admin_id, customer_unread, admin_unread, created_at)
+        SELECT m.sender_id, MIN(m.receiver_id), 0, COUNT(*), MIN(m.created_at)
+        FROM message m JOIN "user" u ON u.id = m.sender_id
+        WHERE u.user_type = 'customer'
+        GROUP BY m.sender_id
+    """)
+    op.execute("""
+        UPDATE message SET read = false, conversation_id = (
+            SELECT c.id FROM conversation c
+            WHERE c.customer_id = message.sender_id OR c.customer_id = message.receiver_id
+            ORDER BY c.id LIMIT 1
+        )
+    """)
+    op.execute("""
+        UPDATE conversation SET
+            last_message_id = (SELECT MAX(m.id) FROM message m WHERE m.conversation_id = conversation.id),
+            last_message_at = (SELECT MAX(m.created_at) FROM message m WHERE m.conversation_id = conversation.id)
+    """)
+    op.execute("""
+        UPDATE conversation SET
+            last_sender_id = (SELECT m.sender_id FROM message m WHERE m.id = conversation.last_message_id),
+            last_message_preview = (SELECT SUBSTR(m.content, 1, 255) FROM message m WHERE m.id = conversation.last_message_id)
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.drop_index('ix_message_conversation_id_created_at')
+        batch_op.drop_constraint('fk_message_conversation_id_conversation', type_='foreignkey')
+        batch_op.drop_column('read')
+        batch_op.drop_column('conversation_id')
+
+    op.drop_index(op.f('ix_conversation_last_message_at'), table_name='conversation')
+    op.drop_index('ix_conversation_admin_id_last_message_at', table_name='conversation')
+    op.drop_table('conversation')
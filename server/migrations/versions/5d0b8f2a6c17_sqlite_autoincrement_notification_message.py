@@ -0,0 +1,47 @@
+"""sqlite autoincrement for notification and message
+
+Revision ID: 5d0b8f2a6c17
+Revises: 1a7e3d9c5b42
+Create Date: 2026-10-19 19:46:02.731904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d0b8f2a6c17'
+down_revision = '1a7e3d9c5b42'
+branch_labels = None
+depends_on = None
+
+# Without AUTOINCREMENT SQLite hands out max(id) + 1, so ids freed by archiving
+# come back and collide with their *_archive rows. Postgres sequences never
+# go back, so there is nothing to do there
+TABLES = ('notification', 'message')
+
+
+def upgrade():
+    if op.get_context().dialect.name != 'sqlite':
+        return
+
+    for table in TABLES:
+        with op.batch_alter_table(table, recreate='always',
+                                  table_kwargs={'sqlite_autoincrement': True}):
+            pass
+        # Continue after the highest id ever used, archived ones included
+        op.execute(sa.text('DELETE FROM sqlite_sequence WHERE name = :table').bindparams(table=table))
+        op.execute(sa.text(
+            f'INSERT INTO sqlite_sequence (name, seq) SELECT :table, '
+            f'max(coalesce((SELECT max(id) FROM "{table}"), 0), coalesce((SELECT max(id) FROM {table}_archive), 0))'
+        ).bindparams(table=table))
+
+
+def downgrade():
+    if op.get_context().dialect.name != 'sqlite':
+        return
+
+    for table in TABLES:
+        with op.batch_alter_table(table, recreate='always',
+                                  table_kwargs={'sqlite_autoincrement': False}):
+            pass
@@ -0,0 +1,53 @@
+"""notification and message created_at not null
+
+Revision ID: 7c3e9a5d2b60
+Revises: 9b4e6f1c3a28
+Create Date: 2026-10-19 21:12:48.406215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3e9a5d2b60'
+down_revision = '9b4e6f1c3a28'
+branch_labels = None
+depends_on = None
+
+# Partitioning already made created_at NOT NULL on Postgres, where it is part
+# of the primary key. This brings the other databases in line with the models
+TABLES = ('notification', 'message')
+
+
+def _reset_sequence(table):
+    # Recreating the table restarts AUTOINCREMENT at the highest live id;
+    # continue after the archived ones too
+    op.execute(sa.text('DELETE FROM sqlite_sequence WHERE name = :table').bindparams(table=table))
+    op.execute(sa.text(
+        f'INSERT INTO sqlite_sequence (name, seq) SELECT :table, '
+        f'max(coalesce((SELECT max(id) FROM "{table}"), 0), coalesce((SELECT max(id) FROM {table}_archive), 0))'
+    ).bindparams(table=table))
+
+
+def upgrade():
+    if op.get_context().dialect.name == 'postgresql':
+        return
+
+    for table in TABLES:
+        op.execute(f'UPDATE "{table}" SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL')
+        with op.batch_alter_table(table, schema=None, table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+            batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+        if op.get_context().dialect.name == 'sqlite':
+            _reset_sequence(table)
+
+
+def downgrade():
+    if op.get_context().dialect.name == 'postgresql':
+        return
+
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None, table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+            batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
+        if op.get_context().dialect.name == 'sqlite':
+            _reset_sequence(table)
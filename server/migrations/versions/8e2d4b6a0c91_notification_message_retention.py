@@ -0,0 +1,151 @@
+"""notification and message retention
+
+Revision ID: 8e2d4b6a0c91
+Revises: 3c9a1f2e7b4d
+Create Date: 2026-10-19 11:40:02.553187
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e2d4b6a0c91'
+down_revision = '3c9a1f2e7b4d'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+
+def _partition_table(table, foreign_keys, indexes):
+    # Postgres cannot turn an existing table into a partitioned one, so the
+    # data is copied into a new parent partitioned by month on created_at.
+    # The primary key has to include the partition key.
+    op.execute(f'ALTER TABLE {table} RENAME TO {table}_unpartitioned')
+    op.execute(f'ALTER INDEX {table}_pkey RENAME TO {table}_unpartitioned_pkey')
+    op.execute(f"""
+        CREATE TABLE {table} (LIKE {table}_unpartitioned INCLUDING DEFAULTS)
+        PARTITION BY RANGE (created_at)
+    """)
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+    op.execute(f"UPDATE {table}_unpartitioned SET created_at = now() at time zone 'utc' WHERE created_at IS NULL")
+    op.execute(f'ALTER TABLE {table} ALTER COLUMN created_at SET NOT NULL')
+    op.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id, created_at)')
+    for column, target, name in foreign_keys:
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({column}) REFERENCES {target} (id)')
+    for name, columns in indexes:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+        op.execute(f'CREATE INDEX {name} ON {table} ({columns})')
+
+    op.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+    op.execute(f"""
+        DO $$
+        DECLARE
+            month date := date_trunc('month', coalesce((SELECT min(created_at) FROM {table}_unpartitioned), now()));
+            last_month date := date_trunc('month', now()) + interval '{MONTHS_AHEAD} months';
+        BEGIN
+            WHILE month <= last_month LOOP
+                EXECUTE format('CREATE TABLE %I PARTITION OF {table} FOR VALUES FROM (%L) TO (%L)',
+                               '{table}_y' || to_char(month, 'YYYY') || 'm' || to_char(month, 'MM'),
+                               month, month + interval '1 month');
+                month := month + interval '1 month';
+            END LOOP;
+        END $$
+    """)
+    op.execute(f'INSERT INTO {table} SELECT * FROM {table}_unpartitioned')
+    op.execute(f'DROP TABLE {table}_unpartitioned')
+
+
+def _unpartition_table(table, foreign_keys, indexes):
+    op.execute(f'ALTER TABLE {table} RENAME TO {table}_partitioned')
+    op.execute(f'CREATE TABLE {table} (LIKE {table}_partitioned INCLUDING DEFAULTS)')
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+    op.execute(f'ALTER TABLE {table} ALTER COLUMN created_at DROP NOT NULL')
+    op.execute(f'INSERT INTO {table} SELECT * FROM {table}_partitioned')
+    op.execute(f'DROP TABLE {table}_partitioned')
+    op.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id)')
+    for column, target, name in foreign_keys:
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({column}) REFERENCES {target} (id)')
+    for name, columns in indexes:
+        op.execute(f'CREATE INDEX {name} ON {table} ({columns})')
+
+
+NOTIFICATION_PARTITIONING = (
+    'notification',
+    [('user_id', '"user"', 'notification_user_id_fkey')],
+    [('ix_notification_user_id_created_at', 'user_id, created_at')],
+)
+MESSAGE_PARTITIONING = (
+    'message',
+    # Named as before, so earlier migrations can still drop them
+    [('sender_id', '"user"', 'message_sender_id_fkey'),
+     ('receiver_id', '"user"', 'message_receiver_id_fkey'),
+     ('conversation_id', 'conversation', 'fk_message_conversation_id_conversation')],
+    [('ix_message_conversation_id_created_at', 'conversation_id, created_at, id')],
+)
+
+
+def upgrade():
+    with op.batch_alter_table('conversation', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('status', sa.String(length=20), server_default='open', nullable=False))
+        batch_op.add_column(sa.Column('closed_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('archived_at', sa.DateTime(), nullable=True))
+
+    op.create_table('notification_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('message', sa.String(length=255), nullable=True),
+    sa.Column('read', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_notification_archive_user_id_created_at', 'notification_archive', ['user_id', 'created_at'], unique=False)
+
+    op.create_table('message_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('conversation_id', sa.Integer(), nullable=True),
+    sa.Column('sender_id', sa.Integer(), nullable=True),
+    sa.Column('receiver_id', sa.Integer(), nullable=True),
+    sa.Column('content', sa.Text(), nullable=True),
+    sa.Column('read', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_message_archive_conversation_id_created_at', 'message_archive', ['conversation_id', 'created_at', 'id'], unique=False)
+
+    if op.get_context().dialect.name != 'postgresql':
+        op.create_index('ix_notification_user_id_created_at', 'notification', ['user_id', 'created_at'], unique=False)
+        return
+
+    # Archived rows are written once and rarely read back, favour size over
+    # speed. lz4 needs Postgres 14+ built with lz4, and the setting only lists
+    # the methods this server was built with
+    lz4 = op.get_bind().execute(sa.text(
+        "SELECT 1 FROM pg_settings WHERE name = 'default_toast_compression' AND 'lz4' = ANY(enumvals)"
+    )).scalar()
+    if lz4:
+        op.execute('ALTER TABLE message_archive ALTER COLUMN content SET COMPRESSION lz4')
+    op.execute('ALTER TABLE message_archive ALTER COLUMN content SET STORAGE MAIN')
+
+    _partition_table(*NOTIFICATION_PARTITIONING)
+    _partition_table(*MESSAGE_PARTITIONING)
+
+
+def downgrade():
+    if op.get_context().dialect.name == 'postgresql':
+        _unpartition_table(*MESSAGE_PARTITIONING)
+        _unpartition_table(*NOTIFICATION_PARTITIONING)
+    op.drop_index('ix_notification_user_id_created_at', table_name='notification')
+
+    op.drop_index('ix_message_archive_conversation_id_created_at', table_name='message_archive')
+    op.drop_table('message_archive')
+    op.drop_index('ix_notification_archive_user_id_created_at', table_name='notification_archive')
+    op.drop_table('notification_archive')
+
+    with op.batch_alter_table('conversation', schema=None) as batch_op:
+        batch_op.drop_column('archived_at')
+        batch_op.drop_column('closed_at')
+        batch_op.drop_column('status')
@@ -0,0 +1,25 @@
+"""rekey geocode cache
+
+Revision ID: 9b4e6f1c3a28
+Revises: 5d0b8f2a6c17
+Create Date: 2026-10-19 20:05:37.184920
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9b4e6f1c3a28'
+down_revision = '5d0b8f2a6c17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keys are now sha1 hashes of the normalized name. Rows under the old keys
+    # would never be read again, and the cache refills itself
+    op.execute('DELETE FROM geocode_cache')
+
+
+def downgrade():
+    op.execute('DELETE FROM geocode_cache')
@@ -2,8 +2,14 @@ from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy_serializer import SerializerMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from replicas import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+def primary_bind():
+    # bind_arguments for reads that must not lag behind a write, even on a GET
+    return {'bind': db.engine}
 
 class User(db.Model, SerializerMixin):
     id = db.Column(db.Integer, primary_key=True)
@@ -18,6 +24,8 @@ class User(db.Model, SerializerMixin):
     date_of_birth = db.Column(db.Date)
     password_hash = db.Column(db.String(255))
     user_type = db.Column(db.String(50), default='customer')
+    # Set when the account is deleted; the rows are purged in the background
+    deleted_at = db.Column(db.DateTime, index=True)
 
     @property
     def password(self):
@@ -30,10 +38,50 @@ class User(db.Model, SerializerMixin):
     def verify_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+# CustomerDeletion Model - progress of a background customer purge
+class CustomerDeletion(db.Model, SerializerMixin):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    requested_by = db.Column(db.Integer)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    progress = db.Column(db.JSON, default=dict)
+    deleted_rows = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+# RevokedToken Model - denylist of logged out JWTs, kept until they expire anyway
+class RevokedToken(db.Model, SerializerMixin):
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False)
+    token_type = db.Column(db.String(10), nullable=False)
+    user_id = db.Column(db.Integer, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+# IdempotencyKey Model - the stored response for a client's Idempotency-Key, replayed on retries
+class IdempotencyKey(db.Model, SerializerMixin):
+    __table_args__ = (
+        db.UniqueConstraint('scope', 'key', name='uq_idempotency_key_scope_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(50), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    user_id = db.Column(db.Integer, index=True)
+    endpoint = db.Column(db.String(100), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='processing')
+    response_code = db.Column(db.Integer)
+    response_body = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
 # Inventory Model
 class Inventory(db.Model, SerializerMixin):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
     item_name = db.Column(db.String(100), nullable=False)
     quantity = db.Column(db.Integer, default=1)
     description = db.Column(db.Text, nullable=True)
@@ -43,7 +91,7 @@ class Inventory(db.Model, SerializerMixin):
 # MovingDetail Model
 class MovingDetail(db.Model, SerializerMixin):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
     from_location = db.Column(db.String(100), nullable=False) 
     to_location = db.Column(db.String(100), nullable=False)    
     from_lat = db.Column(db.Float, nullable=False)  
@@ -56,18 +104,97 @@ class MovingDetail(db.Model, SerializerMixin):
     packing_service = db.Column(db.Boolean, default=False)  
     additional_details = db.Column(db.Text)
     status = db.Column(db.String(50), nullable=False, default='pending')
+    # Bumped on every update; stale writes fail instead of overwriting each other
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+    __mapper_args__ = {'version_id_col': version}
 
 
+# GeocodeCache Model - resolved locations keyed by a hash of their normalized name.
+# Misses are cached too (lat/lon left empty) so they are not retried on every request.
+class GeocodeCache(db.Model, SerializerMixin):
+    key = db.Column(db.String(255), primary_key=True)
+    location = db.Column(db.String(255))
+    lat = db.Column(db.Float)
+    lon = db.Column(db.Float)
+    provider = db.Column(db.String(50))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class Notification(db.Model, SerializerMixin):
+    __table_args__ = (
+        db.Index('ix_notification_user_id_created_at', 'user_id', 'created_at'),
+        # Archived ids must never be handed out again
+        {'sqlite_autoincrement': True},
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     message = db.Column(db.String(255))
     read = db.Column(db.Boolean, default=False)
+    # Part of the primary key of the monthly partitions on Postgres
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+# Conversation Model - one thread per customer, with the latest message denormalized
+# so the thread list never has to touch the message table
+class Conversation(db.Model, SerializerMixin):
+    __table_args__ = (
+        db.Index('ix_conversation_admin_id_last_message_at', 'admin_id', 'last_message_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey('user.id'), unique=True, nullable=False)
+    admin_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    last_message_id = db.Column(db.Integer)
+    last_sender_id = db.Column(db.Integer)
+    last_message_preview = db.Column(db.String(255))
+    last_message_at = db.Column(db.DateTime, index=True)
+    customer_unread = db.Column(db.Integer, nullable=False, default=0)
+    admin_unread = db.Column(db.Integer, nullable=False, default=0)
+    status = db.Column(db.String(20), nullable=False, default='open')
+    closed_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Message(db.Model, SerializerMixin):
+    __table_args__ = (
+        db.Index('ix_message_conversation_id_created_at', 'conversation_id', 'created_at', 'id'),
+        {'sqlite_autoincrement': True},
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    sender_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    receiver_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id'))
+    sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
+    receiver_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
     content = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    read = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+# Archive tables - rows moved here by the retention job keep their original ids.
+# No foreign keys so archiving never has to lock the user table.
+class NotificationArchive(db.Model, SerializerMixin):
+    __tablename__ = 'notification_archive'
+    __table_args__ = (
+        db.Index('ix_notification_archive_user_id_created_at', 'user_id', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer)
+    message = db.Column(db.String(255))
+    read = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class MessageArchive(db.Model, SerializerMixin):
+    __tablename__ = 'message_archive'
+    __table_args__ = (
+        db.Index('ix_message_archive_conversation_id_created_at', 'conversation_id', 'created_at', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    conversation_id = db.Column(db.Integer)
+    sender_id = db.Column(db.Integer)
+    receiver_id = db.Column(db.Integer)
+    content = db.Column(db.Text)
+    read = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,64 @@
+from sqlalchemy import insert, tuple_, update
+
+from models import db, MovingDetail, Notification
+
+STATUSES = ('pending', 'approved', 'rejected', 'completed')
+
+ALLOWED_TRANSITIONS = {
+    'pending': {'approved', 'rejected'},
+    'approved': {'completed', 'rejected', 'pending'},
+    'rejected': {'pending', 'approved'},
+    'completed': set(),
+}
+
+STATUS_NOTIFICATIONS = {
+    'approved': 'Your moving request has been approved. Please start preparing.',
+    'rejected': 'Your moving request has been rejected. Please consider changing the date or details.',
+}
+
+MAX_BULK_TRANSITIONS = 500
+
+
+def allowed_sources(target):
+    return [status for status, targets in ALLOWED_TRANSITIONS.items() if target in targets]
+
+
+def bulk_transition(items, target):
+    """Move every ``{'id', 'version'}`` in ``items`` to ``target`` in one statement.
+
+    A row is only updated if it still has the version the caller saw and its
+    current status may move to ``target``. Returns the updated rows and a
+    ``{id: reason}`` dict for everything that was skipped. The caller commits.
+    """
+    pairs = {(item['id'], item['version']) for item in items}
+    updated = db.session.execute(
+        update(MovingDetail)
+        .where(tuple_(MovingDetail.id, MovingDetail.version).in_(pairs))
+        .where(MovingDetail.status.in_(allowed_sources(target)))
+        .values(status=target, version=MovingDetail.version + 1)
+        .returning(MovingDetail.id, MovingDetail.user_id, MovingDetail.version),
+        execution_options={'synchronize_session': False}
+    ).all()
+
+    message = STATUS_NOTIFICATIONS.get(target)
+    if message and updated:
+        db.session.execute(insert(Notification), [{'user_id': row.user_id, 'message': message} for row in updated])
+
+    conflicts = {}
+    skipped = {moving_detail_id for moving_detail_id, _ in pairs} - {row.id for row in updated}
+    if skipped:
+        current = {
+            row.id: row for row in db.session.query(MovingDetail.id, MovingDetail.status, MovingDetail.version)
+            .filter(MovingDetail.id.in_(skipped))
+        }
+        for item in items:
+            row = current.get(item['id'])
+            if item['id'] not in skipped:
+                continue
+            if row is None:
+                conflicts[item['id']] = 'not found'
+            elif row.version != item['version']:
+                conflicts[item['id']] = f'modified by someone else, now at version {row.version}'
+            else:
+                conflicts[item['id']] = f'cannot move from {row.status} to {target}'
+    return updated, conflicts
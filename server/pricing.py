@@ -0,0 +1,33 @@
+import math
+
+HOME_SIZES = ('bedsitter', 'one bedroom', 'studio', 'two bedroom')
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    R = 6371  # Radius of the Earth in km
+
+    dLat = math.radians(lat2 - lat1)
+    dLon = math.radians(lon2 - lon1)
+    a = math.sin(dLat / 2) * math.sin(dLat / 2) + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dLon / 2) * math.sin(dLon / 2)
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    distance = R * c
+    return distance
+
+def calculate_price(distance, home_size, packing_service):
+    base_price_per_km = 500  # 500 currency units per km
+    size_factor = {
+        "bedsitter": 1,
+        "one bedroom": 1.5,
+        "studio": 1.2,
+        "two bedroom": 2
+    }
+    packing_service_fee = 3000 if packing_service else 0
+
+    price = distance * base_price_per_km * size_factor[home_size.lower()] + packing_service_fee
+    return price
+
+def quote(from_lat, from_lon, to_lat, to_lon, home_size, packing_service):
+    distance = haversine_distance(from_lat, from_lon, to_lat, to_lon)
+    return {
+        'distance_km': round(distance, 2),
+        'price': round(calculate_price(distance, home_size, packing_service), 2)
+    }
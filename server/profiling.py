@@ -0,0 +1,270 @@
+import cProfile
+import itertools
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+from flask import g, has_request_context, request
+from flask_jwt_extended import verify_jwt_in_request
+from sqlalchemy import event
+
+HEADER = 'X-Profile'
+MAX_STATEMENT_LENGTH = 500
+
+
+def collapse(frame, root=None):
+    """Stack of ``frame`` in the collapsed format flamegraph.pl and speedscope
+    read: outermost frame first, frames separated by ``;``."""
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f'{frame.f_globals.get("__name__", "?")}:{code.co_name}:{code.co_firstlineno}')
+        frame = frame.f_back
+    if root:
+        frames.append(root)
+    return ';'.join(reversed(frames))
+
+
+class Sampler:
+    """Takes the stack of every thread that is serving a profiled request,
+    every ``interval`` seconds, from one background thread.
+
+    The thread only wakes up while at least one request is being profiled.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.active = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self, thread_id, root):
+        stacks = Counter()
+        with self._lock:
+            self.active[thread_id] = (root, stacks)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+                self._thread.start()
+            self._wake.set()
+        return stacks
+
+    def stop(self, thread_id):
+        with self._lock:
+            self.active.pop(thread_id, None)
+            if not self.active:
+                self._wake.clear()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, (root, stacks) in self.active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[collapse(frame, root)] += 1
+            del frames
+
+
+class RequestProfile:
+    __slots__ = ('id', 'started', 'mode', 'stacks', 'profile', 'statements', 'status')
+
+    def __init__(self, request_id, mode):
+        self.id = request_id
+        self.started = time.perf_counter()
+        self.mode = mode
+        self.stacks = None
+        self.profile = None
+        self.statements = []
+        self.status = None
+
+
+class Profiler:
+    """Opt-in profiling for the requests this worker serves.
+
+    A request is profiled when an admin sends ``X-Profile: 1`` (sampled
+    stacks) or ``X-Profile: cprofile`` (deterministic, much slower), or when
+    it is picked at ``sample_rate``. Sampled stacks add up across requests
+    for a flame graph. Requests slower than ``slow_ms``, and every profiled
+    one, go into a ring buffer together with their SQL timings.
+
+    Everything is per process: with several workers, each answers for the
+    requests it served itself.
+    """
+
+    def __init__(self, sample_rate=0.0, interval=0.005, slow_ms=500, max_requests=50, max_stacks=20000):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.max_stacks = max_stacks
+        self.sampler = Sampler(interval)
+        self.stacks = Counter()
+        self.requests = deque(maxlen=max_requests)
+        self.profiled = 0
+        self.started_at = datetime.utcnow()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def _requested_mode(self):
+        mode = request.headers.get(HEADER, '').strip().lower()
+        if mode not in ('1', 'true', 'sample', 'cprofile'):
+            return None
+        # Only admins may ask for it; anyone else's header is ignored
+        from resources import get_current_user
+        try:
+            verify_jwt_in_request(optional=True)
+        except Exception:
+            return None
+        user = get_current_user()
+        if not user or user.user_type != 'admin':
+            return None
+        return 'cprofile' if mode == 'cprofile' else 'sample'
+
+    def before_request(self):
+        # Set first so the admin check's own query is timed too
+        state = g.profile = RequestProfile(next(self._ids), None)
+        mode = state.mode = self._requested_mode() if HEADER in request.headers else None
+        if mode is None and self.sample_rate and random.random() < self.sample_rate:
+            mode = state.mode = 'sample'
+
+        if mode == 'sample':
+            state.stacks = self.sampler.start(threading.get_ident(), request.endpoint or 'unmatched')
+        elif mode == 'cprofile':
+            state.profile = cProfile.Profile()
+            try:
+                state.profile.enable()
+            except ValueError:
+                # Another profiler is running in this interpreter
+                state.profile = None
+                state.mode = None
+
+    def after_request(self, response):
+        state = g.get('profile')
+        if state is not None:
+            state.status = response.status_code
+            if state.mode:
+                response.headers['X-Profile-Id'] = str(state.id)
+        return response
+
+    def teardown_request(self, exc=None):
+        state = g.pop('profile', None)
+        if state is None:
+            return
+        if state.mode == 'sample':
+            self.sampler.stop(threading.get_ident())
+        elif state.mode == 'cprofile':
+            state.profile.disable()
+
+        duration = (time.perf_counter() - state.started) * 1000
+        if not state.mode and duration < self.slow_ms:
+            return
+        self.record(state, duration, exc)
+
+    def record(self, state, duration, exc=None):
+        statements = sorted(state.statements, reverse=True)
+        entry = {
+            'id': state.id,
+            'at': datetime.utcnow().isoformat(),
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': request.endpoint,
+            'status': 500 if exc is not None else state.status,
+            'duration_ms': round(duration, 2),
+            'profiled': state.mode,
+            'sql_count': len(statements),
+            'sql_ms': round(sum(ms for ms, _ in statements), 2),
+            'slowest_sql': [{'ms': round(ms, 2), 'statement': statement} for ms, statement in statements[:20]],
+        }
+        if state.stacks is not None:
+            entry['samples'] = sum(state.stacks.values())
+            entry['stacks'] = [{'stack': stack, 'samples': count} for stack, count in state.stacks.most_common(50)]
+        if state.profile is not None:
+            stats = pstats.Stats(state.profile).stats
+            top = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:50]
+            entry['functions'] = [{
+                'function': f'{filename}:{line}({name})',
+                'calls': calls,
+                'total_ms': round(total * 1000, 3),
+                'cumulative_ms': round(cumulative * 1000, 3),
+            } for (filename, line, name), (_, calls, total, cumulative, _) in top]
+
+        with self._lock:
+            self.requests.append(entry)
+            if state.mode:
+                self.profiled += 1
+            if state.stacks:
+                for stack, count in state.stacks.items():
+                    if stack not in self.stacks and len(self.stacks) >= self.max_stacks:
+                        stack = 'other'
+                    self.stacks[stack] += count
+
+    def collapsed(self):
+        with self._lock:
+            return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+    def slowest(self):
+        with self._lock:
+            return sorted(self.requests, key=lambda entry: entry['duration_ms'], reverse=True)
+
+    def find(self, request_id):
+        with self._lock:
+            return next((entry for entry in self.requests if entry['id'] == request_id), None)
+
+    def reset(self):
+        with self._lock:
+            self.stacks.clear()
+            self.requests.clear()
+            self.profiled = 0
+            self.started_at = datetime.utcnow()
+
+    def summary(self):
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'since': self.started_at.isoformat(),
+                'sample_rate': self.sample_rate,
+                'slow_ms': self.slow_ms,
+                'profiled_requests': self.profiled,
+                'recorded_requests': len(self.requests),
+                'samples': sum(self.stacks.values()),
+                'stacks': len(self.stacks),
+            }
+
+
+def _time_statements(engine):
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        connection.info['profile_started'] = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        started = connection.info.pop('profile_started', None)
+        state = g.get('profile') if has_request_context() else None
+        if state is not None and started is not None:
+            state.statements.append(((time.perf_counter() - started) * 1000, statement[:MAX_STATEMENT_LENGTH]))
+
+
+def init_profiling(app, db):
+    # Off by default: nothing is registered, so requests pay nothing for it
+    if not app.config['PROFILING_ENABLED']:
+        return
+    profiler = Profiler(
+        sample_rate=app.config['PROFILING_SAMPLE_RATE'],
+        interval=app.config['PROFILING_INTERVAL_MS'] / 1000,
+        slow_ms=app.config['PROFILING_SLOW_MS'],
+        max_requests=app.config['PROFILING_MAX_REQUESTS'],
+        max_stacks=app.config['PROFILING_MAX_STACKS']
+    )
+    app.extensions['profiler'] = profiler
+    app.before_request(profiler.before_request)
+    app.after_request(profiler.after_request)
+    app.teardown_request(profiler.teardown_request)
+    with app.app_context():
+        for engine in db.engines.values():
+            _time_statements(engine)
@@ -0,0 +1,155 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, or_, select, text
+from sqlalchemy.exc import OperationalError
+
+from models import (db, User, Inventory, MovingDetail, Notification, NotificationArchive,
+                    Conversation, Message, MessageArchive, IdempotencyKey,
+                    CustomerDeletion)
+
+logger = logging.getLogger(__name__)
+
+# Children first, the user row last. Each step is (name, table, criteria for a user id).
+# revoked_token rows stay: deleting them would make the user's tokens valid again,
+# they go with `flask tokens purge-expired` once the tokens have expired
+PURGE_STEPS = [
+    ('notification', Notification.__table__, lambda user_id: Notification.user_id == user_id),
+    ('notification_archive', NotificationArchive.__table__, lambda user_id: NotificationArchive.user_id == user_id),
+    ('message', Message.__table__,
+     lambda user_id: or_(Message.sender_id == user_id, Message.receiver_id == user_id)),
+    ('message_archive', MessageArchive.__table__,
+     lambda user_id: or_(MessageArchive.sender_id == user_id, MessageArchive.receiver_id == user_id)),
+    ('conversation', Conversation.__table__, lambda user_id: Conversation.customer_id == user_id),
+    ('inventory', Inventory.__table__, lambda user_id: Inventory.user_id == user_id),
+    ('moving_detail', MovingDetail.__table__, lambda user_id: MovingDetail.user_id == user_id),
+    ('idempotency_key', IdempotencyKey.__table__, lambda user_id: IdempotencyKey.user_id == user_id),
+    ('user', User.__table__, lambda user_id: User.id == user_id),
+]
+
+LOCK_TIMEOUT = '2s'
+LOCK_RETRIES = 5
+
+
+def _delete_batch(table, criteria, batch_size):
+    if db.engine.dialect.name == 'postgresql':
+        # Give up on a busy row quickly rather than queue behind (and block) live traffic
+        db.session.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+    batch = select(table.c.id).where(criteria).limit(batch_size)
+    return db.session.execute(delete(table).where(table.c.id.in_(batch))).rowcount
+
+
+def _claim(job_id):
+    claimed = CustomerDeletion.query.filter(
+        CustomerDeletion.id == job_id,
+        CustomerDeletion.status.in_(['pending', 'failed'])
+    ).update({CustomerDeletion.status: 'running', CustomerDeletion.updated_at: datetime.utcnow()},
+             synchronize_session=False)
+    db.session.commit()
+    return claimed == 1
+
+
+def run_purge(job_id, batch_size=500, pause=0.05):
+    """Delete everything belonging to the job's customer in short transactions.
+
+    Every batch is one set-based DELETE of at most ``batch_size`` rows and its
+    own commit, so no lock outlives a batch. Progress is written with each
+    batch, and a failed job can be picked up again where it stopped.
+    """
+    if not _claim(job_id):
+        return False
+
+    job = db.session.get(CustomerDeletion, job_id)
+    progress = dict(job.progress or {})
+    try:
+        for name, table, criteria in PURGE_STEPS:
+            while True:
+                for attempt in range(LOCK_RETRIES):
+                    try:
+                        deleted = _delete_batch(table, criteria(job.user_id), batch_size)
+                        break
+                    except OperationalError:
+                        db.session.rollback()
+                        if attempt == LOCK_RETRIES - 1:
+                            raise
+                        time.sleep(pause + 0.5 * 2 ** attempt)
+
+                progress[name] = progress.get(name, 0) + deleted
+                CustomerDeletion.query.filter_by(id=job_id).update({
+                    CustomerDeletion.progress: dict(progress),
+                    CustomerDeletion.deleted_rows: CustomerDeletion.deleted_rows + deleted,
+                    CustomerDeletion.updated_at: datetime.utcnow()
+                }, synchronize_session=False)
+                db.session.commit()
+
+                if deleted < batch_size:
+                    break
+                if pause:
+                    time.sleep(pause)
+    except Exception as e:
+        db.session.rollback()
+        logger.exception('purge of user %s failed', job.user_id)
+        CustomerDeletion.query.filter_by(id=job_id).update({
+            CustomerDeletion.status: 'failed',
+            CustomerDeletion.error: str(e),
+            CustomerDeletion.updated_at: datetime.utcnow()
+        }, synchronize_session=False)
+        db.session.commit()
+        return False
+
+    now = datetime.utcnow()
+    CustomerDeletion.query.filter_by(id=job_id).update({
+        CustomerDeletion.status: 'completed',
+        CustomerDeletion.error: None,
+        CustomerDeletion.updated_at: now,
+        CustomerDeletion.finished_at: now
+    }, synchronize_session=False)
+    db.session.commit()
+    return True
+
+
+def start_purge(job_id):
+    app = current_app._get_current_object()
+    batch_size = app.config['PURGE_BATCH_SIZE']
+    pause = app.config['PURGE_PAUSE_SECONDS']
+
+    def target():
+        with app.app_context():
+            run_purge(job_id, batch_size, pause)
+
+    threading.Thread(target=target, name=f'purge-{job_id}', daemon=True).start()
+
+
+purge_cli = AppGroup('purge', help='Background deletion of customer data.')
+
+
+@purge_cli.command('run')
+@click.option('--batch-size', default=None, type=int)
+@click.option('--pause', default=None, type=float, help='Seconds to sleep between batches.')
+@click.option('--stale-minutes', default=10, show_default=True,
+              help='Retry running jobs that have not reported progress for this long.')
+def purge_command(batch_size, pause, stale_minutes):
+    batch_size = batch_size or current_app.config['PURGE_BATCH_SIZE']
+    pause = current_app.config['PURGE_PAUSE_SECONDS'] if pause is None else pause
+
+    stale = datetime.utcnow() - timedelta(minutes=stale_minutes)
+    CustomerDeletion.query.filter(
+        CustomerDeletion.status == 'running',
+        CustomerDeletion.updated_at < stale
+    ).update({CustomerDeletion.status: 'failed'}, synchronize_session=False)
+    db.session.commit()
+
+    job_ids = [row.id for row in db.session.query(CustomerDeletion.id).filter(
+        CustomerDeletion.status.in_(['pending', 'failed'])).order_by(CustomerDeletion.id)]
+    for job_id in job_ids:
+        ok = run_purge(job_id, batch_size, pause)
+        job = db.session.get(CustomerDeletion, job_id)
+        db.session.refresh(job)
+        click.echo(f'job {job_id} user {job.user_id}: {job.status}, {job.deleted_rows} rows {job.progress}')
+        if not ok and job.status == 'failed':
+            click.echo(f'  {job.error}')
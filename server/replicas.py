@@ -0,0 +1,183 @@
+import itertools
+import logging
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.sql import Select
+
+logger = logging.getLogger(__name__)
+
+READ_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+# When the client last committed a write. Kept by the client rather than the
+# worker, so it holds whichever worker or host serves the next request
+LAST_WRITE_COOKIE = 'kuhama_last_write'
+
+# Seconds behind the primary; an idle replica that has replayed everything it received is not behind
+POSTGRES_LAG = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+def replica_bind_key(index):
+    return f'replica_{index}'
+
+
+class ReplicaPool:
+    """Picks the replica for a read-only request.
+
+    Replicas are checked at most every ``health_interval`` seconds and skipped
+    while down or more than ``max_lag`` seconds behind. A client that committed
+    a write in the last ``read_your_writes`` seconds reads from the primary, and
+    after that only from replicas whose lag is shorter than the time since
+    its write.
+    """
+
+    def __init__(self, bind_keys, health_interval=5.0, max_lag=10.0, read_your_writes=5.0):
+        self.bind_keys = list(bind_keys)
+        self.health_interval = health_interval
+        self.max_lag = max_lag
+        self.read_your_writes = read_your_writes
+        self.state = {key: {'healthy': True, 'lag': 0.0} for key in self.bind_keys}
+        self.checked_at = 0
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+
+    def check(self, engines):
+        for key in self.bind_keys:
+            try:
+                with engines[key].connect() as connection:
+                    if connection.dialect.name == 'postgresql':
+                        lag = float(connection.execute(POSTGRES_LAG).scalar() or 0)
+                    else:
+                        connection.execute(text('SELECT 1'))
+                        lag = 0.0
+                self.state[key] = {'healthy': lag <= self.max_lag, 'lag': lag}
+            except Exception:
+                logger.warning('replica %s failed its health check', key, exc_info=True)
+                self.mark_down(key)
+        self.checked_at = time.monotonic()
+
+    def maybe_check(self, engines):
+        if time.monotonic() - self.checked_at < self.health_interval:
+            return
+        # One thread checks, the rest carry on with the last known state
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if time.monotonic() - self.checked_at >= self.health_interval:
+                self.check(engines)
+        finally:
+            self._lock.release()
+
+    def mark_down(self, key):
+        self.state[key] = {'healthy': False, 'lag': None}
+
+    def choose(self, engines, since_write=None):
+        self.maybe_check(engines)
+        if since_write is not None and since_write < self.read_your_writes:
+            return None
+
+        candidates = [key for key in self.bind_keys if self.state[key]['healthy']
+                      and (since_write is None or self.state[key]['lag'] < since_write)]
+        if not candidates:
+            return None
+        return candidates[next(self._counter) % len(candidates)]
+
+
+class RoutingSession(Session):
+    """db.session that sends plain SELECTs made while serving a GET to a replica.
+
+    Anything else (flushes, UPDATE/DELETE, raw SQL, SELECT ... FOR UPDATE) goes
+    to the primary, and once a request has written, the rest of its reads do too.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if not self._flushing and isinstance(clause, Select) and clause._for_update_arg is None:
+                engine = self._replica_engine()
+                if engine is not None:
+                    return engine
+            else:
+                self.info['wrote'] = True
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica_engine(self):
+        if self.info.get('wrote') or not has_request_context() or request.method not in READ_METHODS:
+            return None
+        pool = current_app.extensions.get('replicas')
+        if pool is None:
+            return None
+
+        # Chosen once per request
+        if 'replica' not in self.info:
+            self.info['replica'] = pool.choose(self._db.engines, seconds_since_write())
+        key = self.info['replica']
+        return self._db.engines[key] if key else None
+
+    def commit(self):
+        super().commit()
+        if self.info.get('wrote') and has_request_context():
+            g.last_write = time.time()
+
+
+def seconds_since_write():
+    try:
+        last_write = float(request.cookies.get(LAST_WRITE_COOKIE, ''))
+    except ValueError:
+        return None
+    since_write = time.time() - last_write
+    # Allow for clock differences between hosts, but not for made-up times
+    return since_write if since_write > -5 else None
+
+
+def set_last_write_cookie(response):
+    last_write = g.get('last_write')
+    if last_write is not None:
+        pool = current_app.extensions['replicas']
+        response.set_cookie(LAST_WRITE_COOKIE, f'{last_write:.3f}',
+                            max_age=int(max(pool.read_your_writes, pool.max_lag)) + 1,
+                            httponly=True, samesite='Lax')
+    return response
+
+
+def _mark_down_on_error(pool, key):
+    def handle_error(context):
+        # Stop routing to it until the next health check says otherwise
+        if context.is_disconnect or context.connection is None:
+            pool.mark_down(key)
+    return handle_error
+
+
+def add_replica_binds(app):
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    for index, uri in enumerate(app.config.get('SQLALCHEMY_REPLICA_URIS') or []):
+        options = {'url': uri, 'pool_pre_ping': True}
+        if uri.startswith('postgresql'):
+            # A dead replica should fail over quickly, not hold the request
+            options['connect_args'] = {'connect_timeout': 2}
+        binds[replica_bind_key(index)] = options
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+
+def init_replicas(app, db):
+    uris = app.config.get('SQLALCHEMY_REPLICA_URIS') or []
+    if not uris:
+        return
+
+    pool = ReplicaPool(
+        [replica_bind_key(index) for index in range(len(uris))],
+        health_interval=app.config['REPLICA_HEALTH_INTERVAL'],
+        max_lag=app.config['REPLICA_MAX_LAG_SECONDS'],
+        read_your_writes=app.config['REPLICA_READ_YOUR_WRITES_SECONDS']
+    )
+    app.extensions['replicas'] = pool
+    app.after_request(set_last_write_cookie)
+
+    with app.app_context():
+        for key in pool.bind_keys:
+            event.listen(db.engines[key], 'handle_error', _mark_down_on_error(pool, key))
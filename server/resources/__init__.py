@@ -0,0 +1,56 @@
+from flask import g, request
+from flask_restful import Api
+
+from extensions import jwt, current_user_id, identity_user_id
+from models import db, User, primary_bind
+from responses import representations
+
+
+def get_pagination_args(default_per_page=20, max_per_page=100):
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', default_per_page, type=int), 1), max_per_page)
+    return page, per_page
+
+
+def _load_user(user_id):
+    # A deleted account counts as no user. Read from the primary, so a lagging
+    # replica cannot bring back an account that was just deleted
+    user = db.session.get(User, user_id, bind_arguments=primary_bind()) if user_id is not None else None
+    return user if user is not None and user.deleted_at is None else None
+
+
+def get_current_user():
+    # Loaded once per request
+    if 'current_user' not in g:
+        g.current_user = _load_user(current_user_id())
+    return g.current_user
+
+
+def load_token_user(jwt_header, jwt_data):
+    # Runs while the token is verified, so every jwt_required endpoint turns
+    # away deleted and purged accounts, and the handler reuses the user
+    g.current_user = _load_user(identity_user_id(jwt_data['sub']))
+    return g.current_user
+
+
+def create_api(blueprint):
+    # JSON (orjson when installed), columnar JSON and MessagePack, picked from the Accept header
+    api = Api(blueprint)
+    api.representations = representations()
+    return api
+
+
+def register_blueprints(app):
+    # Imported here so processes that never serve requests (migrations,
+    # seeding, CLI jobs) do not load the resource modules at all
+    from resources.auth import auth_bp
+    from resources.inventory import inventory_bp
+    from resources.moving import moving_bp
+    from resources.admin import admin_bp
+    from resources.notifications import notifications_bp
+    from resources.messages import messages_bp
+
+    jwt.user_lookup_loader(load_token_user)
+
+    for blueprint in (auth_bp, inventory_bp, moving_bp, admin_bp, notifications_bp, messages_bp):
+        app.register_blueprint(blueprint)
@@ -0,0 +1,263 @@
+import datetime
+
+from flask import Blueprint, Response, current_app, request, stream_with_context
+from flask_restful import Resource
+from flask_jwt_extended import jwt_required
+from models import db, User, Inventory, MovingDetail, CustomerDeletion
+from export import stream_export, export_filename, ExportError, FORMATS
+from purge import start_purge
+from throttling import rate_limited
+from moving_status import STATUSES, ALLOWED_TRANSITIONS, MAX_BULK_TRANSITIONS, bulk_transition
+from resources import create_api, get_current_user
+
+admin_bp = Blueprint('admin', __name__)
+api = create_api(admin_bp)
+
+class AdminCustomerListResource(Resource):
+    @jwt_required()
+    def get(self):
+        current_user = get_current_user()
+
+        if not current_user or current_user.user_type != 'admin':
+            return {'message': 'Access denied'}, 403
+
+        customers = User.query.filter_by(user_type='customer', deleted_at=None).all()
+        return [customer.to_dict() for customer in customers]
+
+api.add_resource(AdminCustomerListResource, '/admin/customers')
+
+class AdminCustomerInventoryResource(Resource):
+    @jwt_required()
+    def get(self, user_id):
+        current_user = get_current_user()
+
+        if not current_user or current_user.user_type != 'admin':
+            return {'message': 'Access denied'}, 403
+
+        # A deleted customer's items are hidden until the purge removes them
+        inventory = Inventory.query.join(User, User.id == Inventory.user_id) \
+            .filter(Inventory.user_id == user_id, User.deleted_at.is_(None)).all()
+        return [item.to_dict() for item in inventory]
+
+api.add_resource(AdminCustomerInventoryResource, '/admin/customer/<int:user_id>/inventory')
+
+class AdminExportResource(Resource):
+    @jwt_required()
+    def get(self, dataset):
+        current_user = get_current_user()
+
+        if not current_user or current_user.user_type != 'admin':
+            return {'message': 'Access denied'}, 403
+
+        fmt = request.args.get('format', 'csv')
+        compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+        try:
+            date_from = request.args.get('from')
+            date_to = request.args.get('to')
+            date_from = datetime.datetime.strptime(date_from, '%Y-%m-%d') if date_from else None
+            date_to = datetime.datetime.strptime(date_to, '%Y-%m-%d') if date_to else None
+        except ValueError:
+            return {'message': 'Invalid date format'}, 400
+
+        try:
+            chunks = stream_export(dataset, fmt, compress, date_from=date_from, date_to=date_to,
+                                   status=request.args.get('status'), user_id=request.args.get('user_id', type=int))
+        except ExportError as e:
+            return {'message': str(e)}, 400
+
+        filename = export_filename(dataset, fmt, compress)
+        return Response(
+            stream_with_context(chunks),
+            mimetype='application/gzip' if compress else FORMATS[fmt],
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+
+api.add_resource(AdminExportResource, '/admin/export/<string:dataset>')
+
+class AdminDeleteCustomerResource(Resource):
+    @jwt_required()
+    @rate_limited('write')
+    def delete(self, user_id):
+        current_user = get_current_user()
+
+        if not current_user or current_user.user_type != 'admin':
+            return {'message': 'Access denied'}, 403
+
+        user_to_delete = User.query.get(user_id)
+        if not user_to_delete or user_to_delete.user_type != 'customer' or user_to_delete.deleted_at:
+            return {'message': 'User not found or not a customer'}, 404
+
+        # Hide the account now; its rows are removed in small batches afterwards
+        user_to_delete.deleted_at = datetime.datetime.utcnow()
+        job = CustomerDeletion(user_id=user_to_delete.id, requested_by=current_user.id)
+        db.session.add(job)
+        db.session.commit()
+
+        if current_app.config['PURGE_IN_BACKGROUND']:
+            start_purge(job.id)
+        return {'message': 'User deleted successfully', 'job': job.to_dict()}, 202
+
+api.add_resource(AdminDeleteCustomerResource, '/admin/delete/customer/<int:user_id>')
+
+class AdminCustomerDeletionResource(Resource):
+    @jwt_required()
+    def get(self, job_id):
+        current_user = get_current_user()
+
+        if not current_user or current_user.user_type != 'admin':
+            return {'message': 'Access denied'}, 403
+
+        job = CustomerDeletion.query.get(job_id)
+        if not job:
+            return {'message': 'Deletion job not found'}, 404
+        return job.to_dict(), 200
+
+api.add_resource(AdminCustomerDeletionResource, '/admin/delete/customer/jobs/<int:job_id>')
+
+class AdminUpdateMovingStatusResource(Resource):
+    @jwt_required()
+    @rate_limited('write')
+    def put(self, moving_detail_id):
+        current_user = get_current_user()
+
+        if not current_user or current_user.user_type != 'admin':
+            return {'message': 'Access denied'}, 403
+
+        moving_detail = MovingDetail.query.get(moving_detail_id)
+        if not moving_detail:
+            return {'message': 'Moving detail not found'}, 404
+
+        data = request.get_json()
+        new_status = data.get('status')
+        if new_status not in STATUSES:
+            return {'message': 'Invalid status'}, 400
+        version = data.get('version', moving_detail.version)
+        if version != moving_detail.version:
+            return {'message': 'Moving detail was modified by someone else', 'version': moving_detail.version}, 409
+        if new_status not in ALLOWED_TRANSITIONS[moving_detail.status]:
+            return {'message': f'Cannot move from {moving_detail.status} to {new_status}'}, 409
+
+        # Same guarded update as the bulk endpoint, which also notifies the customer
+        updated, conflicts = bulk_transition([{'id': moving_detail.id, 'version': version}], new_status)
+        if conflicts:
+            db.session.rollback()
+            return {'message': 'Moving detail was modified by someone else'}, 409
+        db.session.commit()
+        return {'message': 'Moving status updated successfully', 'version': updated[0].version}, 200
+
+api.add_resource(AdminUpdateMovingStatusResource, '/admin/moving/update-status/<int:moving_detail_id>')
+
+class AdminBulkUpdateMovingStatusResource(Resource):
+    @jwt_required()
+    @rate_limited('write')
+    def put(self):
+        current_user = get_current_user()
+
+        if not current_user or current_user.user_type != 'admin':
+            return {'message': 'Access denied'}, 403
+
+        data = request.get_json()
+        new_status = data.get('status')
+        if new_status not in STATUSES:
+            return {'message': 'Invalid status'}, 400
+
+        items = data.get('items')
+        if not isinstance(items, list) or not items or len(items) > MAX_BULK_TRANSITIONS:
+            return {'message': f'Provide between 1 and {MAX_BULK_TRANSITIONS} items'}, 400
+        if not all(isinstance(item, dict) and isinstance(item.get('id'), int) and isinstance(item.get('version'), int)
+                   for item in items):
+            return {'message': 'Every item needs an integer id and version'}, 400
+
+        updated, conflicts = bulk_transition(items, new_status)
+        db.session.commit()
+
+        return {
+            'updated': [{'id': row.id, 'version': row.version} for row in updated],
+            'conflicts': [{'id': moving_detail_id, 'reason': reason} for moving_detail_id, reason in conflicts.items()]
+        }, 200
+
+api.add_resource(AdminBulkUpdateMovingStatusResource, '/admin/moving/update-status')
+
+def get_profiler():
+    return current_app.extensions.get('profiler')
+
+PROFILING_DISABLED = {'message': 'Profiling is disabled, set PROFILING_ENABLED'}, 404
+
+class AdminProfilingResource(Resource):
+    @jwt_required()
+    def get(self):
+        current_user = get_current_user()
+
+        if not current_user or current_user.user_type != 'admin':
+            return {'message': 'Access denied'}, 403
+
+        profiler = get_profiler()
+        if profiler is None:
+            return PROFILING_DISABLED
+        return profiler.summary()
+
+    @jwt_required()
+    def delete(self):
+        current_user = get_current_user()
+
+        if not current_user or current_user.user_type != 'admin':
+            return {'message': 'Access denied'}, 403
+
+        profiler = get_profiler()
+        if profiler is None:
+            return PROFILING_DISABLED
+        profiler.reset()
+        return {'message': 'Profiling data cleared'}, 200
+
+api.add_resource(AdminProfilingResource, '/admin/profiling')
+
+class AdminProfilingStacksResource(Resource):
+    @jwt_required()
+    def get(self):
+        current_user = get_current_user()
+
+        if not current_user or current_user.user_type != 'admin':
+            return {'message': 'Access denied'}, 403
+
+        profiler = get_profiler()
+        if profiler is None:
+            return PROFILING_DISABLED
+        # Collapsed stacks, one per line, for flamegraph.pl or speedscope
+        return Response(profiler.collapsed(), mimetype='text/plain')
+
+api.add_resource(AdminProfilingStacksResource, '/admin/profiling/stacks')
+
+class AdminProfilingRequestListResource(Resource):
+    @jwt_required()
+    def get(self):
+        current_user = get_current_user()
+
+        if not current_user or current_user.user_type != 'admin':
+            return {'message': 'Access denied'}, 403
+
+        profiler = get_profiler()
+        if profiler is None:
+            return PROFILING_DISABLED
+        # The full stacks and functions are on the single request
+        return [{key: value for key, value in entry.items() if key not in ('stacks', 'functions')}
+                for entry in profiler.slowest()]
+
+api.add_resource(AdminProfilingRequestListResource, '/admin/profiling/requests')
+
+class AdminProfilingRequestDetailResource(Resource):
+    @jwt_required()
+    def get(self, request_id):
+        current_user = get_current_user()
+
+        if not current_user or current_user.user_type != 'admin':
+            return {'message': 'Access denied'}, 403
+
+        profiler = get_profiler()
+        if profiler is None:
+            return PROFILING_DISABLED
+        entry = profiler.find(request_id)
+        if entry is None:
+            return {'message': 'Request not found, it may have left the buffer or been served by another worker'}, 404
+        return entry
+
+api.add_resource(AdminProfilingRequestDetailResource, '/admin/profiling/requests/<int:request_id>')
@@ -0,0 +1,190 @@
+import datetime
+
+from flask import Blueprint, request
+from flask_restful import Resource
+from flask_jwt_extended import create_access_token, create_refresh_token, decode_token, jwt_required, get_jwt, get_jwt_identity
+from werkzeug.security import check_password_hash, generate_password_hash
+from models import db, User, Notification
+from revocation import get_revocation_store
+from idempotency import idempotent
+from throttling import rate_limited
+from resources import create_api, get_current_user
+
+auth_bp = Blueprint('auth', __name__)
+api = create_api(auth_bp)
+
+class HomePageResource(Resource):
+    def get(self):
+        return {
+            'message': 'Welcome to Kukuhamisha App'
+        }
+
+api.add_resource(HomePageResource, '/')
+
+class LoginResource(Resource):
+    @rate_limited('login')
+    def post(self):
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return {'message': 'Expected a JSON object'}, 400
+
+        user = User.query.filter(
+            (User.username == data['login']) |
+            (User.email == data['login']) |
+            (User.phone_number == data['login'])
+        ).filter(User.deleted_at.is_(None)).first()
+
+        if user and check_password_hash(user.password_hash, data['password']):
+            access_token = create_access_token(identity=user.id)
+            refresh_token = create_refresh_token(identity=user.id)
+            return {'access_token': access_token, 'refresh_token': refresh_token}, 200
+        else:
+            return {'message': 'Invalid username, email, phone number or password'}, 401
+
+api.add_resource(LoginResource, '/login')
+
+class RefreshResource(Resource):
+    @jwt_required(refresh=True)
+    @rate_limited('refresh')
+    def post(self):
+        # No password check, but the account must still be there
+        user = get_current_user()
+        if not user:
+            return {'message': 'User not found'}, 401
+        access_token = create_access_token(identity=user.id)
+        return {'access_token': access_token}, 200
+
+api.add_resource(RefreshResource, '/refresh')
+
+class LogoutResource(Resource):
+    @jwt_required()
+    def post(self):
+        store = get_revocation_store()
+        store.revoke(get_jwt())
+
+        # Revoke the refresh token too when the client hands it over
+        data = request.get_json(silent=True)
+        if isinstance(data, dict) and data.get('refresh_token'):
+            try:
+                refresh_payload = decode_token(data['refresh_token'])
+            except Exception:
+                return {'message': 'Invalid refresh token'}, 400
+            if refresh_payload.get('type') != 'refresh' or refresh_payload.get('sub') != get_jwt_identity():
+                return {'message': 'Invalid refresh token'}, 400
+            store.revoke(refresh_payload)
+
+        db.session.commit()
+        return {'message': 'User logged out successfully'}, 200
+
+api.add_resource(LogoutResource, '/logout')
+
+class SignupResource(Resource):
+    @rate_limited('signup')
+    @idempotent
+    def post(self):
+        data = request.get_json()
+
+        # Basic validation
+        if not all(key in data for key in ['first_name', 'surname', 'username', 'email', 'phone_number', 'gender', 'date_of_birth', 'password']):
+            return {'message': 'Missing required fields'}, 400
+
+        # Convert date_of_birth to datetime object
+        try:
+            date_of_birth = datetime.datetime.strptime(data['date_of_birth'], '%Y-%m-%d')
+            # Check if user is at least 18 years old
+            today = datetime.date.today()
+            age = today.year - date_of_birth.year - ((today.month, today.day) < (date_of_birth.month, date_of_birth.day))
+            if age < 18:
+                return {'message': 'You must be at least 18 years old to register.'}, 400
+        except ValueError:
+            return {'message': 'Invalid date format'}, 400
+
+        # Create a new user
+        new_user = User(
+            first_name=data['first_name'],
+            second_name=data.get('second_name', ''),  
+            surname=data['surname'],
+            username=data['username'],
+            email=data['email'],
+            phone_number=data['phone_number'],
+            gender=data['gender'],
+            location=data.get('location', ''),
+            date_of_birth=date_of_birth,
+            user_type='customer'
+        )
+        new_user.password_hash = generate_password_hash(data['password'])
+
+        db.session.add(new_user)
+        try:
+            db.session.flush()
+        except Exception as e:
+            db.session.rollback()
+            return {'message': str(e)}, 500
+
+        # Notify admins, in the same transaction as the new user
+        admin_users = User.query.filter_by(user_type='admin').all()
+        for admin in admin_users:
+            new_notification = Notification(user_id=admin.id, message="New user signed up: " + new_user.username)
+            db.session.add(new_notification)
+
+        try:
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return {'message': str(e)}, 500
+
+        return {'message': 'User registered successfully'}, 201
+
+api.add_resource(SignupResource, '/signup')
+
+class UserResource(Resource):
+    @jwt_required()
+    def get(self):
+
+        user = get_current_user()
+
+        if user:
+
+            return user.to_dict()
+        else:
+            return {'message': 'User not found'}, 404
+
+api.add_resource(UserResource, '/user/info')
+
+class UpdateUserResource(Resource):
+    @jwt_required()
+    @rate_limited('write')
+    def put(self):
+        user = get_current_user()
+
+        if user:
+            data = request.get_json()
+
+            if 'email' in data:
+                if "@" not in data['email']:
+                    return {'message': 'Invalid email format'}, 400
+                user.email = data['email']
+            if 'phone_number' in data:
+                if not data['phone_number'].isdigit() or len(data['phone_number']) != 9:
+                    return {'message': 'Phone number must be exactly 9 digits'}, 400
+                user.phone_number = data['phone_number']
+            if 'first_name' in data:
+                user.first_name = data['first_name']
+            if 'second_name' in data:
+                user.second_name = data['second_name']
+            if 'surname' in data:
+                user.surname = data['surname']
+            if 'gender' in data:
+                user.gender = data['gender']
+            if 'location' in data:
+                user.location = data['location']
+            if 'date_of_birth' in data:
+                user.date_of_birth = datetime.strptime(data['date_of_birth'], '%Y-%m-%d')
+
+
+            db.session.commit()
+            return {'message': 'User information updated successfully'}, 200
+        else:
+            return {'message': 'User not found'}, 404
+
+api.add_resource(UpdateUserResource, '/user/update')
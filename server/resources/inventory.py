@@ -0,0 +1,124 @@
+from flask import Blueprint, request
+from flask_restful import Resource
+from flask_jwt_extended import jwt_required
+from models import db, Inventory
+from idempotency import idempotent
+from throttling import rate_limited
+from resources import create_api, get_current_user
+
+inventory_bp = Blueprint('inventory', __name__)
+api = create_api(inventory_bp)
+
+class InventoryResource(Resource):
+    @jwt_required()
+    @rate_limited('write')
+    @idempotent
+    def post(self):
+        current_user = get_current_user()
+
+        if not current_user or current_user.user_type != 'customer':
+            return {'message': 'Access denied'}, 403
+        
+        from forms import InventoryForm  # wtforms is only loaded once a form is actually posted
+        form = InventoryForm(request.form)
+
+        if form.validate():
+            new_item = Inventory(
+                user_id=current_user.id,
+                item_name=form.item_name.data,
+                quantity=form.quantity.data,
+                description=form.description.data,
+                category=form.category.data,
+                condition=form.condition.data
+            )
+            db.session.add(new_item)
+            db.session.commit()
+
+            return {'message': 'Item added to inventory successfully'}, 201
+        else:
+            return {'message': 'Invalid input'}, 400
+
+api.add_resource(InventoryResource, '/inventory/add')
+
+class InventoryListResource(Resource):
+    @jwt_required()
+    def get(self):
+        current_user = get_current_user()
+
+        if not current_user or current_user.user_type != 'customer':
+            return {'message': 'Access denied'}, 403
+        
+        search_keyword = request.args.get('keyword', type=str)
+        filter_category = request.args.get('category', type=str)
+        filter_condition = request.args.get('condition', type=str)
+
+        query = Inventory.query.filter_by(user_id=current_user.id)
+
+        if search_keyword:
+            query = query.filter(Inventory.item_name.ilike(f'%{search_keyword}%') | 
+                                  Inventory.description.ilike(f'%{search_keyword}%'))
+        if filter_category:
+            query = query.filter(Inventory.category.ilike(f'%{filter_category}%'))
+        if filter_condition:
+            query = query.filter(Inventory.condition.ilike(f'%{filter_condition}%'))
+
+        user_inventory = query.all()
+
+        if user_inventory:
+            inventory_list = [item.to_dict() for item in user_inventory]
+            return inventory_list
+        else:
+            return {'message': 'No inventory items found'}, 404
+
+api.add_resource(InventoryListResource, '/inventory')
+
+class InventoryUpdateResource(Resource):
+    @jwt_required()
+    @rate_limited('write')
+    def put(self, item_id):
+        current_user = get_current_user()
+
+        if not current_user or current_user.user_type != 'customer':
+            return {'message': 'Access denied'}, 403
+        
+        item = Inventory.query.filter_by(id=item_id, user_id=current_user.id).first()
+
+        if not item:
+            return {'message': 'Item not found'}, 404
+
+        data = request.get_json()
+        if 'item_name' in data:
+            item.item_name = data['item_name']
+        if 'quantity' in data:
+            item.quantity = data['quantity']
+        if 'description' in data:
+            item.description = data['description']
+        if 'category' in data:
+            item.category = data['category']
+        if 'condition' in data:
+            item.condition = data['condition']
+
+        db.session.commit()
+        return {'message': 'Inventory item updated successfully'}, 200
+
+api.add_resource(InventoryUpdateResource, '/inventory/update/<int:item_id>')
+
+class InventoryDeleteResource(Resource):
+    @jwt_required()
+    @rate_limited('write')
+    def delete(self, item_id):
+        current_user = get_current_user()
+
+        if not current_user or current_user.user_type != 'customer':
+            return {'message': 'Access denied'}, 403
+        
+        item = Inventory.query.filter_by(id=item_id, user_id=current_user.id).first()
+
+        if not item:
+            return {'message': 'Item not found'}, 404
+
+        db.session.delete(item)
+        db.session.commit()
+        return {'message': 'Inventory item deleted successfully'}, 200
+
+api.add_resource(InventoryDeleteResource, '/inventory/delete/<int:item_id>')
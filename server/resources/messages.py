@@ -0,0 +1,180 @@
+import datetime
+
+from flask import Blueprint, request
+from flask_restful import Resource
+from flask_jwt_extended import jwt_required
+from sqlalchemy import tuple_
+from models import db, Message, MessageArchive, Conversation
+from messaging import get_or_create_conversation, post_message, mark_conversation_read, conversation_summary
+from archive import include_archived, with_archive, row_to_dict
+from idempotency import idempotent
+from throttling import rate_limited
+from resources import create_api, get_current_user, get_pagination_args
+
+messages_bp = Blueprint('messages', __name__)
+api = create_api(messages_bp)
+
+class SendMessageResource(Resource):
+    @jwt_required()
+    @rate_limited('write')
+    @idempotent
+    def post(self):
+        current_user = get_current_user()
+        if not current_user:
+            return {'message': 'User not found'}, 404
+        # Admins reply through /conversations/<id>/messages
+        if current_user.user_type != 'customer':
+            return {'message': 'Access denied'}, 403
+
+        data = request.get_json()
+        if 'content' not in data:
+            return {'message': 'No message content provided'}, 400
+
+        user_id = current_user.id
+        conversation = get_or_create_conversation(user_id)
+        if conversation.admin_id is None:
+            db.session.rollback()
+            return {'message': 'Admin user not found'}, 404
+
+        post_message(conversation, user_id, data['content'])
+        conversation_id = conversation.id  # read before the commit expires it
+        db.session.commit()
+        return {'message': 'Message sent successfully', 'conversation_id': conversation_id}, 201
+
+api.add_resource(SendMessageResource, '/send-message')
+
+class ConversationListResource(Resource):
+    @jwt_required()
+    def get(self):
+        current_user = get_current_user()
+        if not current_user:
+            return {'message': 'User not found'}, 404
+
+        page, per_page = get_pagination_args()
+        is_admin = current_user.user_type == 'admin'
+
+        if is_admin:
+            query = Conversation.query.filter_by(admin_id=current_user.id)
+        else:
+            query = Conversation.query.filter_by(customer_id=current_user.id)
+
+        conversations = query.order_by(Conversation.last_message_at.desc(), Conversation.id.desc()) \
+            .limit(per_page).offset((page - 1) * per_page).all()
+
+        return {
+            'page': page,
+            'per_page': per_page,
+            'conversations': [conversation_summary(conversation, is_admin) for conversation in conversations]
+        }, 200
+
+api.add_resource(ConversationListResource, '/conversations')
+
+def _get_conversation(conversation_id):
+    current_user = get_current_user()
+    conversation = Conversation.query.get(conversation_id)
+
+    if not current_user or not conversation:
+        return current_user, None
+    if current_user.user_type != 'admin' and conversation.customer_id != current_user.id:
+        return current_user, None
+    return current_user, conversation
+
+class ConversationMessagesResource(Resource):
+    @jwt_required()
+    def get(self, conversation_id):
+        current_user, conversation = _get_conversation(conversation_id)
+        if not conversation:
+            return {'message': 'Conversation not found'}, 404
+
+        per_page = min(max(request.args.get('per_page', 50, type=int), 1), 100)
+        before_id = request.args.get('before', type=int)
+
+        source = with_archive(Message, MessageArchive) if include_archived() else Message.__table__
+        query = db.session.query(source).filter(source.c.conversation_id == conversation.id)
+        if before_id:
+            before = db.session.query(source.c.created_at, source.c.id).filter(
+                source.c.id == before_id, source.c.conversation_id == conversation.id).first()
+            if not before:
+                return {'message': 'Message not found'}, 404
+            query = query.filter(tuple_(source.c.created_at, source.c.id) < tuple_(before.created_at, before.id))
+
+        # Newest page first, one extra row tells us whether there is an older page
+        messages = query.order_by(source.c.created_at.desc(), source.c.id.desc()).limit(per_page + 1).all()
+        has_more = len(messages) > per_page
+        messages = list(reversed(messages[:per_page]))
+
+        return {
+            'conversation_id': conversation_id,
+            'messages': [row_to_dict(message) for message in messages],
+            'next_before': messages[0].id if has_more else None
+        }, 200
+
+    @jwt_required()
+    @rate_limited('write')
+    def post(self, conversation_id):
+        current_user, conversation = _get_conversation(conversation_id)
+        if not conversation:
+            return {'message': 'Conversation not found'}, 404
+
+        data = request.get_json()
+        if 'content' not in data:
+            return {'message': 'No message content provided'}, 400
+
+        if current_user.user_type == 'admin' and conversation.admin_id is None:
+            conversation.admin_id = current_user.id
+
+        post_message(conversation, current_user.id, data['content'])
+        db.session.commit()
+        return {'message': 'Message sent successfully'}, 201
+
+api.add_resource(ConversationMessagesResource, '/conversations/<int:conversation_id>/messages')
+
+class ConversationReadResource(Resource):
+    @jwt_required()
+    @rate_limited('write')
+    def post(self, conversation_id):
+        current_user, conversation = _get_conversation(conversation_id)
+        if not conversation:
+            return {'message': 'Conversation not found'}, 404
+
+        mark_conversation_read(conversation, current_user.id)
+        db.session.commit()
+        return {'message': 'Conversation marked as read'}, 200
+
+api.add_resource(ConversationReadResource, '/conversations/<int:conversation_id>/read')
+
+class ConversationCloseResource(Resource):
+    @jwt_required()
+    @rate_limited('write')
+    def put(self, conversation_id):
+        current_user = get_current_user()
+
+        if not current_user or current_user.user_type != 'admin':
+            return {'message': 'Access denied'}, 403
+
+        conversation = Conversation.query.get(conversation_id)
+        if not conversation:
+            return {'message': 'Conversation not found'}, 404
+
+        conversation.status = 'closed'
+        conversation.closed_at = datetime.datetime.utcnow()
+        db.session.commit()
+        return {'message': 'Conversation closed'}, 200
+
+api.add_resource(ConversationCloseResource, '/conversations/<int:conversation_id>/close')
+
+class AdminMessagesResource(Resource):
+    @jwt_required()
+    def get(self):
+        current_user = get_current_user()
+
+        if not current_user or current_user.user_type != 'admin':
+            return {'message': 'Access denied'}, 403
+
+        page, per_page = get_pagination_args()
+        messages = Message.query.filter_by(receiver_id=current_user.id) \
+            .order_by(Message.created_at.desc(), Message.id.desc()) \
+            .limit(per_page).offset((page - 1) * per_page).all()
+        return [message.to_dict() for message in messages]
+
+api.add_resource(AdminMessagesResource, '/admin/messages')
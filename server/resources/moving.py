@@ -0,0 +1,192 @@
+import datetime
+
+from flask import Blueprint, request
+from flask_restful import Resource
+from flask_jwt_extended import jwt_required
+from models import db, MovingDetail
+from pricing import HOME_SIZES, haversine_distance, calculate_price, quote
+from geocoding import get_geocoder, resolve_coordinates
+from idempotency import idempotent
+from throttling import rate_limited
+from resources import create_api, get_current_user
+
+moving_bp = Blueprint('moving', __name__)
+api = create_api(moving_bp)
+
+class MovingDetailResource(Resource):
+    @jwt_required()
+    @rate_limited('write')
+    @idempotent
+    def post(self):
+        current_user = get_current_user()
+
+        if not current_user or current_user.user_type != 'customer':
+            return {'message': 'Access denied'}, 403
+
+        from forms import MovingDetailForm
+        form = MovingDetailForm(request.form)
+
+        if form.validate():
+            from_point, to_point = resolve_coordinates(
+                form.from_location.data, form.from_lat.data, form.from_lon.data,
+                form.to_location.data, form.to_lat.data, form.to_lon.data)
+            errors = {}
+            if not from_point:
+                errors['from_location'] = ['Could not find this location']
+            if not to_point:
+                errors['to_location'] = ['Could not find this location']
+            if errors:
+                db.session.commit()  # keep the geocoder's cached misses
+                return errors, 400
+
+            # Calculate the distance
+            distance = haversine_distance(*from_point, *to_point)
+
+            # Calculate price based on distance, home size, and whether packing service is included
+            price = calculate_price(
+                distance, form.home_size.data, form.packing_service.data)
+
+            new_moving_detail = MovingDetail(
+                user_id=current_user.id,
+                from_location=form.from_location.data,
+                to_location=form.to_location.data,
+                from_lat=from_point[0],
+                from_lon=from_point[1],
+                to_lat=to_point[0],
+                to_lon=to_point[1],
+                home_size=form.home_size.data.lower(), # using lower case for consistency
+                moving_date=form.moving_date.data,
+                price=price,
+                packing_service=form.packing_service.data,
+                status='pending',
+                additional_details=form.additional_details.data
+            )
+            db.session.add(new_moving_detail)
+            db.session.commit()
+
+            return {'message': 'Moving details added successfully'}, 201
+        else:
+            return form.errors, 400
+
+api.add_resource(MovingDetailResource, '/moving/add')
+
+class MovingQuoteResource(Resource):
+    @jwt_required()
+    def post(self):
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return {'message': 'Expected a JSON object'}, 400
+
+        try:
+            coordinates = [float(data[key]) if data.get(key) is not None else None
+                           for key in ('from_lat', 'from_lon', 'to_lat', 'to_lon')]
+        except (TypeError, ValueError):
+            return {'message': 'Invalid coordinates'}, 400
+
+        from_point, to_point = resolve_coordinates(
+            data.get('from_location'), coordinates[0], coordinates[1],
+            data.get('to_location'), coordinates[2], coordinates[3])
+        db.session.commit()
+        if not from_point or not to_point:
+            return {'message': 'Provide coordinates or a known location for both ends of the move'}, 400
+
+        home_size = str(data.get('home_size', '')).lower()
+        if home_size not in HOME_SIZES:
+            return {'message': 'Invalid home size'}, 400
+
+        return quote(*from_point, *to_point, home_size, bool(data.get('packing_service'))), 200
+
+api.add_resource(MovingQuoteResource, '/moving/quote')
+
+class GeocodeResource(Resource):
+    @jwt_required()
+    def post(self):
+        data = request.get_json(silent=True)
+        locations = data.get('locations') if isinstance(data, dict) else None
+
+        if not isinstance(locations, list) or not locations or len(locations) > 100:
+            return {'message': 'Provide a list of up to 100 locations'}, 400
+
+        results = get_geocoder().geocode_many([str(location) for location in locations])
+        db.session.commit()
+        return {
+            location: {'lat': point[0], 'lon': point[1]} if point else None
+            for location, point in results.items()
+        }, 200
+
+api.add_resource(GeocodeResource, '/geocode')
+
+class MovingDetailListResource(Resource):
+    @jwt_required()
+    def get(self):
+        current_user = get_current_user()
+
+        if not current_user or current_user.user_type != 'customer':
+            return {'message': 'Access denied'}, 403
+        
+        user_moving_details = MovingDetail.query.filter_by(user_id=current_user.id).all()
+
+        if user_moving_details:
+            details_list = [detail.to_dict() for detail in user_moving_details]
+            return details_list
+        else:
+            return {'message': 'No moving details found'}, 404
+
+api.add_resource(MovingDetailListResource, '/moving')
+
+class MovingDetailUpdateResource(Resource):
+    @jwt_required()
+    @rate_limited('write')
+    def put(self, detail_id):
+        current_user = get_current_user()
+
+        if not current_user or current_user.user_type != 'customer':
+            return {'message': 'Access denied'}, 403
+        
+        moving_detail = MovingDetail.query.filter_by(id=detail_id, user_id=current_user.id).first()
+
+        if not moving_detail:
+            return {'message': 'Moving detail not found'}, 404
+
+        data = request.get_json()
+        if 'from_location' in data:
+            moving_detail.from_location = data['from_location']
+        if 'to_location' in data:
+            moving_detail.to_location = data['to_location']
+        if 'home_size' in data:
+            moving_detail.home_size = data['home_size']
+        if 'moving_date' in data:
+            # Ensure that moving_date is in the correct format
+            try:
+                moving_detail.moving_date = datetime.strptime(data['moving_date'], '%Y-%m-%d %H:%M:%S')
+            except ValueError:
+                return {'message': 'Invalid moving date format'}, 400
+        if 'price' in data:
+            moving_detail.price = data['price']
+        if 'additional_details' in data:
+            moving_detail.additional_details = data['additional_details']
+
+        db.session.commit()
+        return {'message': 'Moving detail updated successfully'}, 200
+
+api.add_resource(MovingDetailUpdateResource, '/moving/update/<int:detail_id>')
+
+class MovingDetailDeleteResource(Resource):
+    @jwt_required()
+    @rate_limited('write')
+    def delete(self, detail_id):
+        current_user = get_current_user()
+
+        if not current_user or current_user.user_type != 'customer':
+            return {'message': 'Access denied'}, 403
+        
+        moving_detail = MovingDetail.query.filter_by(id=detail_id, user_id=current_user.id).first()
+
+        if not moving_detail:
+            return {'message': 'Moving detail not found'}, 404
+
+        db.session.delete(moving_detail)
+        db.session.commit()
+        return {'message': 'Moving detail deleted successfully'}, 200
+
+api.add_resource(MovingDetailDeleteResource, '/moving/delete/<int:detail_id>')
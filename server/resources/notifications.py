@@ -0,0 +1,73 @@
+from flask import Blueprint, request
+from flask_restful import Resource
+from flask_jwt_extended import jwt_required
+from models import db, Notification, NotificationArchive
+from archive import include_archived, with_archive, row_to_dict
+from throttling import rate_limited
+from resources import create_api, get_current_user
+
+notifications_bp = Blueprint('notifications', __name__)
+api = create_api(notifications_bp)
+
+class AdminNotificationsResource(Resource):
+    @jwt_required()
+    def get(self):
+        current_user = get_current_user()
+
+        if not current_user or current_user.user_type != 'admin':
+            return {'message': 'Access denied'}, 403
+
+        if include_archived():
+            notifications = with_archive(Notification, NotificationArchive)
+            rows = db.session.query(notifications).filter(notifications.c.user_id == current_user.id) \
+                .order_by(notifications.c.created_at).all()
+            return [row_to_dict(row) for row in rows]
+
+        notifications = Notification.query.filter_by(user_id=current_user.id).all()
+        return [notification.to_dict() for notification in notifications]
+
+api.add_resource(AdminNotificationsResource, '/admin/notifications')
+
+class UserNotificationsResource(Resource):
+    @jwt_required()
+    def get(self):
+        current_user = get_current_user()
+
+        if not current_user or current_user.user_type != 'customer':
+            return {'message': 'Access denied'}, 403
+
+        if include_archived():
+            notifications = with_archive(Notification, NotificationArchive)
+            rows = db.session.query(notifications).filter(notifications.c.user_id == current_user.id) \
+                .order_by(notifications.c.created_at).all()
+            return [row_to_dict(row) for row in rows]
+
+        notifications = Notification.query.filter_by(user_id=current_user.id).all()
+        return [notification.to_dict() for notification in notifications]
+
+api.add_resource(UserNotificationsResource, '/user/notifications')
+
+class NotificationsReadResource(Resource):
+    @jwt_required()
+    @rate_limited('write')
+    def post(self):
+        current_user = get_current_user()
+        if not current_user:
+            return {'message': 'User not found'}, 404
+
+        # No body marks every notification read, {"ids": [...]} only those
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return {'message': 'Expected a JSON object'}, 400
+        ids = data.get('ids')
+        if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, int) for i in ids)):
+            return {'message': 'ids must be a list of notification ids'}, 400
+
+        query = Notification.query.filter(Notification.user_id == current_user.id, Notification.read.isnot(True))
+        if ids is not None:
+            query = query.filter(Notification.id.in_(ids))
+        updated = query.update({Notification.read: True}, synchronize_session=False)
+        db.session.commit()
+        return {'message': 'Notifications marked as read', 'updated': updated}, 200
+
+api.add_resource(NotificationsReadResource, '/user/notifications/read', '/admin/notifications/read')
@@ -0,0 +1,120 @@
+import gzip
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import current_app, make_response, request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON = 'application/json'
+COLUMNAR_JSON = 'application/vnd.kuhama.columnar+json'
+MSGPACK = 'application/msgpack'
+
+COMPRESSIBLE_TYPES = {JSON, COLUMNAR_JSON, MSGPACK, 'text/csv', 'text/html', 'text/plain', 'application/x-ndjson'}
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def dumps_json(data):
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, default=_default, separators=(',', ':')).encode('utf-8')
+
+
+def columnar(data):
+    """``[{"id": 1, "name": "a"}, ...]`` -> ``{"keys": ["id", "name"], "rows": [[1, "a"], ...]}``.
+
+    Applied to a list of objects, or to the lists of objects inside a dict
+    (paginated responses), so key names are sent once instead of per row.
+    """
+    if isinstance(data, list) and data and all(isinstance(item, dict) for item in data):
+        keys = list(dict.fromkeys(key for item in data for key in item))
+        return {'keys': keys, 'rows': [[item.get(key) for key in keys] for item in data]}
+    if isinstance(data, dict):
+        return {key: columnar(value) if isinstance(value, list) else value for key, value in data.items()}
+    return data
+
+
+def _response(body, code, headers):
+    response = make_response(body, code)
+    response.headers.extend(headers or {})
+    response.vary.add('Accept')
+    return response
+
+
+def output_json(data, code, headers=None):
+    return _response(dumps_json(data), code, headers)
+
+
+def output_columnar_json(data, code, headers=None):
+    return _response(dumps_json(columnar(data)), code, headers)
+
+
+def output_msgpack(data, code, headers=None):
+    return _response(msgpack.packb(data, default=_default, use_bin_type=True), code, headers)
+
+
+def representations():
+    # Plain JSON first: it is what clients that send no Accept header (or */*) get
+    formats = {JSON: output_json, COLUMNAR_JSON: output_columnar_json}
+    if msgpack is not None:
+        formats[MSGPACK] = output_msgpack
+        formats['application/x-msgpack'] = output_msgpack
+    return formats
+
+
+def _encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted.quality('br') > 0 and accepted.quality('br') >= accepted.quality('gzip'):
+        return 'br'
+    if accepted.quality('gzip') > 0:
+        return 'gzip'
+    return None
+
+
+def compress_response(response):
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES
+            or request.method == 'HEAD'):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < current_app.config['COMPRESS_MIN_SIZE']:
+        return response
+
+    encoding = _encoding()
+    if encoding == 'br':
+        response.set_data(brotli.compress(body, quality=current_app.config['COMPRESS_BROTLI_QUALITY']))
+    elif encoding == 'gzip':
+        response.set_data(gzip.compress(body, compresslevel=current_app.config['COMPRESS_GZIP_LEVEL']))
+    else:
+        return response
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_responses(app):
+    app.after_request(compress_response)
@@ -0,0 +1,155 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, RevokedToken, primary_bind
+from extensions import identity_user_id
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings. No false negatives, so a miss
+    means the token was definitely not revoked."""
+
+    def __init__(self, capacity=100000, error_rate=0.001):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationStore:
+    """In-process mirror of the revoked_token table.
+
+    New rows are pulled at most every ``refresh_interval`` seconds, so checking
+    a token that was never revoked costs no query. A bloom hit is confirmed
+    against the table. A token revoked by another worker is picked up by the
+    next refresh.
+
+    Each refresh reads the rows revoked since ``overlap`` seconds before the
+    newest one seen. Ids and revoked_at are set before the revoking transaction
+    commits, so a row can become visible after newer ones; the overlap catches
+    it, and the rows read twice are already in the filter.
+    """
+
+    def __init__(self, capacity=100000, refresh_interval=2.0, rebuild_interval=3600, overlap=60):
+        self.capacity = capacity
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.overlap = timedelta(seconds=overlap)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.bloom = BloomFilter(self.capacity)
+        self.last_seen = None
+        self.refreshed_at = 0
+        self.built_at = time.monotonic()
+
+    def needs_refresh(self):
+        return time.monotonic() - self.refreshed_at >= self.refresh_interval
+
+    def pending(self):
+        # Query for the rows to add, shared with the ASGI app's async engine
+        query = select(RevokedToken.jti, RevokedToken.revoked_at).where(RevokedToken.expires_at > datetime.utcnow())
+        if self.last_seen is not None:
+            query = query.where(RevokedToken.revoked_at >= self.last_seen - self.overlap)
+        return query
+
+    def apply(self, rows):
+        # rows are (jti, revoked_at) pairs from pending()
+        for jti, revoked_at in rows:
+            if jti not in self.bloom:
+                self.bloom.add(jti)
+            if revoked_at is not None and (self.last_seen is None or revoked_at > self.last_seen):
+                self.last_seen = revoked_at
+        self.refreshed_at = time.monotonic()
+
+    def needs_rebuild(self):
+        # Bits cannot be removed, so the filter is rebuilt from the live rows
+        # once it fills up or gets old enough to be carrying expired tokens
+        return (self.bloom.count >= self.capacity
+                or time.monotonic() - self.built_at >= self.rebuild_interval)
+
+    def refresh(self):
+        with self._lock:
+            if not self.needs_refresh():
+                return
+            if self.needs_rebuild():
+                self.reset()
+            self.apply(db.session.execute(self.pending(), bind_arguments=primary_bind()).all())
+
+    def is_revoked(self, jti):
+        if self.needs_refresh():
+            self.refresh()
+        if jti not in self.bloom:
+            return False
+        return db.session.execute(select(RevokedToken.id).filter_by(jti=jti),
+                                  bind_arguments=primary_bind()).first() is not None
+
+    def revoke(self, payload):
+        token = RevokedToken(
+            jti=payload['jti'],
+            token_type=payload.get('type', 'access'),
+            user_id=identity_user_id(payload.get('sub')),
+            expires_at=datetime.utcfromtimestamp(payload['exp'])
+        )
+        try:
+            with db.session.begin_nested():
+                db.session.add(token)
+        except IntegrityError:
+            pass  # already revoked
+        with self._lock:
+            self.bloom.add(payload['jti'])
+
+
+def get_revocation_store():
+    store = current_app.extensions.get('revocation_store')
+    if store is None:
+        store = RevocationStore(
+            capacity=current_app.config['JWT_REVOCATION_CAPACITY'],
+            refresh_interval=current_app.config['JWT_REVOCATION_REFRESH_SECONDS'],
+            overlap=current_app.config['JWT_REVOCATION_OVERLAP_SECONDS']
+        )
+        current_app.extensions['revocation_store'] = store
+    return store
+
+
+def init_revocation(jwt):
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return get_revocation_store().is_revoked(jwt_payload['jti'])
+
+
+tokens_cli = AppGroup('tokens', help='Revoked token maintenance.')
+
+
+@tokens_cli.command('purge-expired')
+def purge_expired_command():
+    # Expired tokens are rejected on their own, their denylist rows are dead weight
+    deleted = RevokedToken.query.filter(RevokedToken.expires_at <= datetime.utcnow()).delete(
+        synchronize_session=False)
+    db.session.commit()
+    click.echo(f'removed {deleted} expired revocations')
@@ -1,9 +1,11 @@
-from app import app, db
-from models import User, Inventory, MovingDetail, Notification, Message
+from app import create_app
+from models import db, User, Inventory, MovingDetail, Notification, Conversation
+from messaging import post_message
 from datetime import datetime, timedelta
 
 # Function to add initial data to the database
-def seed_data():
+def seed_data(app=None):
+    app = app or create_app(with_api=False)
     with app.app_context():
         
         user1 = User(
@@ -34,6 +36,11 @@ def seed_data():
         )
         user2.password = 'Gichachi@123'
 
+        # Flush the users first so the rows below get real foreign keys
+        db.session.add(user1)
+        db.session.add(user2)
+        db.session.flush()
+
         inventory1 = Inventory(
             user_id=user1.id,
             item_name="Table",
@@ -66,20 +73,15 @@ def seed_data():
             created_at=datetime.utcnow()
         )
 
-        message1 = Message(
-            sender_id=user1.id,  
-            receiver_id=user2.id, 
-            content="Hello, I need assistance with my moving details",
-            created_at=datetime.utcnow()
-        )
+        conversation1 = Conversation(customer_id=user1.id, admin_id=user2.id)
+        db.session.add(conversation1)
+        db.session.flush()
+        post_message(conversation1, user1.id, "Hello, I need assistance with my moving details")
 
         # Add objects to session and commit to database
-        db.session.add(user1)
-        db.session.add(user2)
         db.session.add(inventory1)
         db.session.add(moving_detail1)
         db.session.add(notification1)
-        db.session.add(message1)
         db.session.commit()
 
 # Run the seeding function
@@ -0,0 +1,209 @@
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, request
+
+from extensions import current_user_id
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_limit(limit):
+    """``"5/minute"`` -> ``(capacity, tokens per second)``."""
+    count, period = limit.split('/')
+    count = int(count)
+    return count, count / PERIODS[period.strip().rstrip('s')]
+
+
+def _refill(tokens, updated, now, capacity, rate):
+    if tokens is None:
+        return capacity
+    return min(capacity, tokens + (now - updated) * rate)
+
+
+class MemoryBackend:
+    """Buckets in a dict, for a single process (development, tests)."""
+
+    def __init__(self):
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now):
+        with self._lock:
+            tokens, updated = self.buckets.get(key, (None, now))
+            tokens = _refill(tokens, updated, now, capacity, rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.buckets[key] = (tokens, now)
+            if len(self.buckets) > 100000:
+                # A full bucket is the same as no bucket
+                self.buckets = {k: v for k, v in self.buckets.items() if now - v[1] < 3600}
+        return allowed, 0 if allowed else (1 - tokens) / rate
+
+
+class SQLiteBackend:
+    """Buckets in a local SQLite file, so every gunicorn worker on the host
+    draws from the same buckets. Each take is one short write transaction."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._takes = 0
+
+    def _connection(self):
+        # One connection per thread, and a new one after a fork
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=1, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute('CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL, updated REAL)')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def take(self, key, capacity, rate, now):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT tokens, updated FROM bucket WHERE key = ?', (key,)).fetchone()
+            tokens = _refill(row[0] if row else None, row[1] if row else now, now, capacity, rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            connection.execute('INSERT OR REPLACE INTO bucket (key, tokens, updated) VALUES (?, ?, ?)',
+                               (key, tokens, now))
+            self._takes += 1
+            if self._takes % 1000 == 0:
+                connection.execute('DELETE FROM bucket WHERE updated < ?', (now - 86400,))
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        return allowed, 0 if allowed else (1 - tokens) / rate
+
+
+def create_backend(storage):
+    if storage == 'memory':
+        return MemoryBackend()
+    if storage.startswith('sqlite:///'):
+        return SQLiteBackend(storage[len('sqlite:///'):])
+    raise ValueError(f'Unknown rate limit storage {storage}')
+
+
+def get_backend():
+    backend = current_app.extensions.get('rate_limits')
+    if backend is None:
+        backend = create_backend(current_app.config['RATELIMIT_STORAGE'])
+        current_app.extensions['rate_limits'] = backend
+    return backend
+
+
+def _login_identifier():
+    data = request.get_json(silent=True)
+    login = data.get('login') if isinstance(data, dict) else None
+    return login.strip().lower() if isinstance(login, str) and login.strip() else None
+
+
+KEY_FUNCTIONS = {
+    'ip': lambda: request.remote_addr,
+    'user': current_user_id,
+    'login': _login_identifier,
+}
+
+
+def rate_limited(name):
+    """Token buckets for the ``RATE_LIMITS[name]`` rules, one bucket per IP,
+    user or login identifier. Goes below ``jwt_required`` so the user is known."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not current_app.config['RATELIMIT_ENABLED']:
+                return fn(*args, **kwargs)
+
+            backend = get_backend()
+            now = time.time()
+            for key_name, limit in current_app.config['RATE_LIMITS'].get(name, {}).items():
+                value = KEY_FUNCTIONS[key_name]()
+                if value is None:
+                    continue
+                capacity, rate = parse_limit(limit)
+                try:
+                    allowed, retry_after = backend.take(f'{name}:{key_name}:{value}', capacity, rate, now)
+                except sqlite3.Error:
+                    # Better to let the request through than to fail it over the limiter
+                    logger.warning('rate limit storage unavailable', exc_info=True)
+                    continue
+                if not allowed:
+                    return {'message': 'Too many requests, try again later'}, 429, \
+                        {'Retry-After': str(math.ceil(retry_after))}
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def request_queue_seconds():
+    # Set by the proxy when it accepted the request: "t=<seconds, ms or us since epoch>"
+    header = request.headers.get('X-Request-Start', '').replace('t=', '')
+    try:
+        started = float(header)
+    except ValueError:
+        return None
+    while started > 1e11:
+        started /= 1000
+    return max(0.0, time.time() - started)
+
+
+class LoadShedder:
+    """Caps the requests a process works on at once.
+
+    Requests wait for a slot up to ``queue_timeout`` seconds and are turned
+    away with a 503 after that, as are requests that already waited longer
+    than that in front of the worker (``X-Request-Start``). A retry a second
+    later is cheaper than a request that times out anyway.
+    """
+
+    def __init__(self, max_concurrent, queue_timeout, retry_after=1):
+        self.slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+    def _shed(self):
+        return {'message': 'Server is busy, try again shortly'}, 503, {'Retry-After': str(self.retry_after)}
+
+    def before_request(self):
+        if request.method == 'OPTIONS':
+            return None
+        queued = request_queue_seconds()
+        if queued is not None and queued > self.queue_timeout:
+            return self._shed()
+        if self.slots is not None:
+            if not self.slots.acquire(timeout=self.queue_timeout):
+                return self._shed()
+            g.load_shed_slot = True
+        return None
+
+    def teardown_request(self, exc=None):
+        if g.pop('load_shed_slot', False):
+            self.slots.release()
+
+
+def init_throttling(app):
+    if app.config['LOAD_SHED_QUEUE_MS'] <= 0:
+        return
+    shedder = LoadShedder(
+        app.config['LOAD_SHED_MAX_CONCURRENT'],
+        app.config['LOAD_SHED_QUEUE_MS'] / 1000,
+        app.config['LOAD_SHED_RETRY_AFTER']
+    )
+    app.extensions['load_shedder'] = shedder
+    app.before_request(shedder.before_request)
+    app.teardown_request(shedder.teardown_request)
@@ -0,0 +1,11 @@
+import os
+import tempfile
+
+from app import create_app
+
+app = create_app({
+    'MIGRATIONS_ENABLED': False,
+    # Workers share rate limit buckets through a file on the host
+    'RATELIMIT_STORAGE': os.environ.get(
+        'RATELIMIT_STORAGE', 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'kuhama-ratelimit.sqlite')),
+})